@@ -3,6 +3,8 @@ import pandas as pd
 import os
 import json
 
+from utils.job_store import JobStore
+
 base_url = "https://api.adzuna.com/v1/api/jobs/us/search/"
 APP_ID = "4772744a"
 APP_KEY = "4b3246141e23b548d10c0dcc52789d3c"
@@ -56,26 +58,23 @@ def save_to_csv(data, file_path):
 
     print(f"Job listings saved to {file_path}")
 
-def save_to_json(data, file_path):
+def save_to_store(data, store_dir, legacy_json_file=None):
     if not data:
         print("No jobs to save.")
         return
 
-    if os.path.isfile(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
+    # Only the new records are written; the old JSON array is taken over on the first run
+    store = JobStore(store_dir)
+    if len(store) == 0 and legacy_json_file and os.path.isfile(legacy_json_file):
+        with open(legacy_json_file, 'r', encoding='utf-8') as f:
             try:
-                existing_data = json.load(f)
+                store.append(json.load(f))
             except json.JSONDecodeError:
-                existing_data = [] # If file is empty or invalid, start with an empty list
-    else:
-        existing_data = []
+                pass # If file is empty or invalid, start with an empty store
+    store.append(data)
 
-    updated_data = existing_data + data
-
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(updated_data, f, indent=4, ensure_ascii=False)
-
-    print(f"Job listings saved to {file_path}")
+    print(f"Job listings appended to {store_dir} ({len(store)} in total)")
+    return store
 
 
 def main():
@@ -88,6 +87,7 @@ def main():
 
     csv_file = "adzunaAPI_jobs.csv"
     json_file = "adzunaAPI_jobs.json"
+    store_dir = "adzunaAPI_jobs"
     num_of_pages = 5
 
     job_listings = []
@@ -101,7 +101,10 @@ def main():
                 job_listings.extend(jobs_data)
 
     save_to_csv(job_listings, csv_file)
-    save_to_json(job_listings, json_file)
+    # Only the new listings are written; the JSON array is a separate export step that reads the whole store
+    store = save_to_store(job_listings, store_dir, legacy_json_file=json_file)
+    if store is not None:
+        print(f"Run `python -m utils.job_store --dir {store_dir} export {json_file}` to refresh the JSON export")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,36 @@
-from fastapi import FastAPI
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
-from app.routers import courses, jobs, user
+from app.routers import admin, courses, jobs, user
+from configs import METRICS_ENABLED
+from utils.corpus import corpus_loader
+from utils.metrics import registry
+from utils.profiling import request_profiler
+
+requests_total = registry.counter(
+    "trended_http_requests_total", "HTTP requests handled.", ["route", "status"]
+)
+request_seconds = registry.histogram(
+    "trended_http_request_seconds", "HTTP request latency.", ["route"]
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the corpus in the background, so the server accepts connections immediately
+    corpus_loader.start()
+    yield
+    corpus_loader.stop()
+    jobs.shutdown()
+
 
-app = FastAPI(title="TrendEd Pathfinder API")
+app = FastAPI(title="TrendEd Pathfinder API", lifespan=lifespan)
 
 # for dev
 # app.add_middleware(
@@ -16,10 +41,106 @@ app = FastAPI(title="TrendEd Pathfinder API")
 #     allow_headers=["*"],
 # )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    if not METRICS_ENABLED:
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    # One series per route: the request path, or the route template if it has parameters
+    route = request.scope.get("route")
+    if route is None:
+        path = "unmatched"
+    elif "{" in route.path:
+        path = route.path
+    else:
+        path = request.url.path
+    request_seconds.observe(time.perf_counter() - start, route=path)
+    requests_total.inc(route=path, status=response.status_code)
+    return response
+
+
+@app.middleware("http")
+async def profile_matching_requests(request: Request, call_next):
+    # Only matching requests, when asked for by an admin or picked by sampling
+    requested = request.headers.get("x-profile") == "1" and admin.is_admin(
+        request.headers.get("x-admin-token")
+    )
+    if not request.url.path.startswith("/jobs/") or not request_profiler.wants(requested):
+        return await call_next(request)
+    profile = request_profiler.begin()
+    if profile is None:
+        return await call_next(request)
+    start = time.perf_counter()
+    ended = False
+
+    def end():
+        nonlocal ended
+        if ended:
+            return None
+        ended = True
+        return request_profiler.end(
+            profile,
+            time.perf_counter() - start,
+            method=request.method,
+            path=request.url.path,
+            query=request.url.query,
+        )
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        end()
+        raise
+    body = response.body_iterator
+    if not requested:
+        # Sampled requests stream as usual; the profile ends once the body, such as NDJSON, is generated
+        async def profiled_body():
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                end()
+
+        response.body_iterator = profiled_body()
+        # A client that disconnects first can leave the body unstarted, so its finally never runs
+        weakref.finalize(response.body_iterator, end)
+        return response
+
+    # The admin who asked gets the profile id in a header, so the body is generated before it is sent
+    chunks = [chunk async for chunk in body]
+    profile_id = end()
+
+    async def buffered_body():
+        for chunk in chunks:
+            yield chunk
+
+    response.body_iterator = buffered_body()
+    if profile_id is not None:
+        response.headers["X-Profile-Id"] = str(profile_id)
+    return response
+
+
 # Include Routers
 app.include_router(courses.router, prefix="/courses", tags=["Course Api"])
 app.include_router(jobs.router, prefix="/jobs", tags=["Job Api"])
 app.include_router(user.router, prefix="/user", tags=["User Api"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin Api"])
+
+
+@app.get("/ready")
+async def ready():
+    """Report whether a corpus is loaded, and which version."""
+    status = corpus_loader.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose request, pipeline stage, corpus and cache metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 # Update the path to the actual static files location
@@ -0,0 +1,40 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import Response
+
+from configs import ADMIN_TOKEN
+from utils.profiling import request_profiler
+
+router = APIRouter()
+
+
+def is_admin(token):
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """List the slowest profiled requests, slowest first."""
+    return request_profiler.profiles()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: int):
+    """Download a request profile in pstats format (open with snakeviz or python -m pstats)."""
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    _, data = profile
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={
+            "Content-Disposition": f'attachment; filename="request-{profile_id}.prof"'
+        },
+    )
@@ -1,47 +1,90 @@
-import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
 
-from fastapi import APIRouter, Query
-
-from utils.azure_blob_storage import container_client
 from utils.comparator import TECHNICAL_SKILLS
+from utils.corpus import corpus_loader
+from utils.course_catalog import COURSE_FIELDS, CourseCatalog
+from utils.encoded_body import EncodedBody
+from utils.listing import page, page_headers, parse_fields, project
+from utils.metrics import registry
 
 router = APIRouter()
 
+# Replaced when the corpus loader sees a new catalog version, i.e. when the blob's ETag changes
+catalog = None
+skills_body = EncodedBody(TECHNICAL_SKILLS)
+
+
+def load_catalog(data, version):
+    global catalog
+    catalog = CourseCatalog(data["wpi_courses.json"], version)
+
+
+corpus_loader.subscribe(load_catalog)
+
+
+catalog_courses = registry.gauge(
+    "trended_catalog_courses", "Courses in the course catalog."
+)
+
+
+@registry.collector
+def collect_catalog_metrics():
+    if catalog is not None:
+        catalog_courses.set(len(catalog.courses))
+
+
+def current_catalog():
+    if catalog is None:
+        raise HTTPException(status_code=503, detail="The course catalog is still loading")
+    return catalog
+
+
+def encoded_response(request, body):
+    """Send pre-serialized bytes, or 304 if the client's copy is current."""
+    status_code, content, headers = body.select(
+        request.headers.get("accept-encoding"), request.headers.get("if-none-match")
+    )
+    return Response(
+        content=content,
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
 
 @router.get("/get_departments")
-async def get_departments():
+async def get_departments(request: Request):
     """Fetch all unique departments from WPI courses."""
-    blob_client = container_client.get_blob_client("wpi_courses.json")
-    try:
-        course_data = json.loads(blob_client.download_blob().readall())
-        departments = list(set(course["Department"] for course in course_data))
-        return departments
-    except Exception as e:
-        return {"error": str(e)}
+    return encoded_response(request, current_catalog().departments_body)
 
 
 @router.get("/get_skills")
-async def get_skills():
+async def get_skills(request: Request):
     """Fetch all unique skills from WPI courses."""
-    return TECHNICAL_SKILLS
+    return encoded_response(request, skills_body)
 
 
 @router.get("/get_courses")
-async def get_courses(department: str = Query(...)):
-    """Fetch courses for a specific department."""
-    blob_client = container_client.get_blob_client("wpi_courses.json")
+async def get_courses(
+    request: Request,
+    department: str = Query(...),
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1),
+    fields: str | None = Query(None),
+):
+    """Fetch courses for a specific department, optionally one page and a subset of fields at a time."""
+    catalog = current_catalog()
+    if offset == 0 and limit is None and not fields:
+        return encoded_response(request, catalog.department_body(department))
+
     try:
-        course_data = json.loads(blob_client.download_blob().readall())
-        filtered_courses = [
-            {
-                "code": course["Code"],
-                "title": course["Title"],
-                "description": course["Description"],
-                "department": course["Department"],
-            }
-            for course in course_data
-            if department == "All" or course["Department"] == department
-        ]
-        return filtered_courses
-    except Exception as e:
-        return {"error": str(e)}
+        selected_fields = parse_fields(fields, COURSE_FIELDS)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    courses = catalog.department_courses(department)
+    courses_page, next_offset = page(courses, offset, limit)
+    return JSONResponse(
+        content=project(courses_page, selected_fields),
+        headers=page_headers(len(courses), next_offset),
+    )
@@ -1,47 +1,357 @@
-import json
+from itertools import islice
+from typing import Literal
 
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Cookie, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 
-from utils.azure_blob_storage import container_client
-from utils.comparator import extract_job_descriptions, find_top_n_jobs_lda
+from app.routers.user import database
+from configs import MATCH_WORKERS
+from utils.comparator import TECHNICAL_SKILLS, extract_job_descriptions, skill_matcher
+from utils.corpus import corpus_loader
+from utils.encoded_body import serialize
+from utils.job_index import (
+    INDEX_TYPES,
+    load_or_build_course_vectors,
+    load_or_build_index,
+)
+from utils.listing import page, page_headers, parse_fields, project
+from utils.metrics import registry, stage
+from utils.profiling import profiled_steps
+from utils.result_cache import ResultCache, profile_key
+from utils.skill_gap import SkillIncidence
+from utils.worker_pool import MatchingPool
 
 router = APIRouter()
 
-blob_client_courses = container_client.get_blob_client("wpi_courses.json")
-blob_client_jobs = container_client.get_blob_client("adzunaAPI_jobs.json")
-course_data = json.loads(blob_client_courses.download_blob().readall())
-job_data = json.loads(blob_client_jobs.download_blob().readall())
+
+class Matching:
+    """Everything derived from one version of the course catalog and job corpus."""
+
+    def __init__(self, course_data, job_data, previous=None):
+        # Matching models are fitted once per corpus version, and every catalog course
+        # is vectorized once per model, not once per request
+        self.job_descriptions = extract_job_descriptions(job_data)
+        self.job_indexes = {
+            method: load_or_build_index(method, self.job_descriptions)
+            for method in INDEX_TYPES
+        }
+        self.course_vectors = {
+            method: load_or_build_course_vectors(index, course_data)
+            for method, index in self.job_indexes.items()
+        }
+        self.skill_incidence = SkillIncidence.build(
+            TECHNICAL_SKILLS, self.job_descriptions, course_data, skill_matcher
+        )
+        # Score in pre-warmed worker processes when configured, so matching does not block the event loop
+        self.pool = None
+        if MATCH_WORKERS:
+            # Workers hold the saved artifacts, so they are kept when no index or course vectors changed
+            if (
+                previous is not None
+                and previous.pool is not None
+                and previous.artifact_versions() == self.artifact_versions()
+            ):
+                self.pool = previous.pool
+            else:
+                self.pool = MatchingPool(MATCH_WORKERS, self.artifact_versions())
+                self.pool.warm()
+
+    def artifact_versions(self):
+        """Identify the corpus, catalog and models that results are computed from."""
+        return {
+            method: (
+                index.version,
+                self.course_vectors[method].manifest["catalog_version"],
+            )
+            for method, index in self.job_indexes.items()
+        }
+
+    def model_version(self):
+        return ",".join(
+            f"{method}:{index_version[:12]}:{catalog_version[:12]}"
+            for method, (index_version, catalog_version) in self.artifact_versions().items()
+        )
+
+
+# Replaced as a whole when the corpus loader publishes a new version,
+# so a request always sees one consistent corpus
+matching = None
+result_cache = ResultCache()
+
+
+def load_matching(data, version):
+    global matching
+    previous = matching
+    matching = Matching(data["wpi_courses.json"], data["adzunaAPI_jobs.json"], previous)
+    # Requests already queued on a replaced pool still finish
+    if previous is not None and previous.pool is not None and previous.pool is not matching.pool:
+        previous.pool.shutdown(cancel_pending=False)
+
+
+corpus_loader.subscribe(load_matching)
+
+
+def shutdown():
+    if matching is not None and matching.pool is not None:
+        matching.pool.shutdown()
+
+
+corpus_jobs = registry.gauge(
+    "trended_corpus_jobs", "Jobs in the matching corpus (after skill filtering)."
+)
+result_cache_lookups = registry.counter(
+    "trended_result_cache_lookups_total", "find_jobs result cache lookups.", ["outcome"]
+)
+result_cache_size = registry.gauge(
+    "trended_result_cache_entries", "Entries in the find_jobs result cache."
+)
+skill_cache_lookups = registry.counter(
+    "trended_skill_matcher_cache_lookups_total", "Skill matcher cache lookups.", ["outcome"]
+)
+pool_in_flight = registry.gauge(
+    "trended_pool_in_flight", "Matching tasks submitted to the worker pool and not finished."
+)
+
+
+@registry.collector
+def collect_matching_metrics():
+    cache = result_cache.stats()
+    result_cache_lookups.set_total(cache["hits"], outcome="hit")
+    result_cache_lookups.set_total(cache["misses"], outcome="miss")
+    result_cache_size.set(cache["size"])
+    skills = skill_matcher.cache_info()
+    skill_cache_lookups.set_total(skills.hits, outcome="hit")
+    skill_cache_lookups.set_total(skills.misses, outcome="miss")
+    if matching is not None:
+        corpus_jobs.set(len(matching.job_descriptions))
+        if matching.pool is not None:
+            pool_in_flight.set(matching.pool.stats()["in_flight"])
+
+
+def current_matching():
+    if matching is None:
+        raise HTTPException(status_code=503, detail="The job corpus is still loading")
+    return matching
+
+
+JOB_FIELDS = ("title", "description", "employer", "location", "url")
+
+
+def job_response(job):
+    return {
+        "title": job["Title"],
+        "description": job["Description"],
+        "employer": job["Employer"],
+        "location": job["Location"],
+        "url": job["URL"],
+    }
+
+
+async def rank_jobs(matching, method, code_sets, weight_sets, top_n):
+    """Return the (job rows, scores) of the top N jobs per course profile."""
+    # Scoring in the pool awaits, and the corpus may be replaced meanwhile, so results are
+    # stored under the version they were computed against
+    version = matching.model_version()
+    result_cache.validate(version)
+    keys = [
+        profile_key(method, codes, weights, top_n)
+        for codes, weights in zip(code_sets, weight_sets)
+    ]
+    results = [result_cache.get(key) for key in keys]
+
+    # Score every profile that missed the cache in one stacked pass
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        missing_codes = [code_sets[i] for i in missing]
+        missing_weights = [weight_sets[i] for i in missing]
+        if matching.pool is not None:
+            with stage("pool_rank"):
+                ranked = await matching.pool.rank(
+                    method, missing_codes, missing_weights, top_n
+                )
+        else:
+            profiles = matching.course_vectors[method].profiles(
+                missing_codes, missing_weights
+            )
+            ranked = matching.job_indexes[method].top_n_job_indices(profiles, top_n)
+        for i, result in zip(missing, ranked):
+            results[i] = result
+            result_cache.put(keys[i], result, version)
+    return results
+
 
 @router.get("/find_jobs")
-async def find_jobs(courses: str = Query(...), top_n: int = Query(5)):
-    """Find top N jobs based on selected courses."""
+async def find_jobs(
+    courses: str = Query(...),
+    top_n: int = Query(5),
+    method: str = Query("lda", pattern="^(lda|tfidf)$"),
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1),
+    fields: str | None = Query(None),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """Find top N jobs based on selected courses, optionally one page and a subset of fields at a time."""
+    try:
+        selected_fields = parse_fields(fields, JOB_FIELDS)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    matching = current_matching()
+
+    if format == "ndjson":
+        selected_course_codes = list(dict.fromkeys(courses.split(",")))
+        return StreamingResponse(
+            # Starlette steps sync generators in its thread pool, outside the request's profile
+            profiled_steps(stream_jobs(
+                matching,
+                method,
+                selected_course_codes,
+                top_n,
+                offset,
+                limit,
+                selected_fields,
+            )),
+            media_type="application/x-ndjson",
+        )
+
+    try:
+        selected_course_codes = list(dict.fromkeys(courses.split(",")))
+        # Every page ranks the same top N, so later pages are served from the result cache
+        ranked = await rank_jobs(matching, method, [selected_course_codes], [None], top_n)
+        job_rows, _ = ranked[0]
+        rows_page, next_offset = page(list(job_rows), offset, limit)
+
+        with stage("json_encode"):
+            return JSONResponse(
+                content=project(
+                    [job_response(matching.job_descriptions[row]) for row in rows_page],
+                    selected_fields,
+                ),
+                headers=page_headers(len(job_rows), next_offset),
+            )
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+def stream_jobs(matching, method, course_codes, top_n, offset, limit, fields):
+    """Yield the ranked jobs as newline-delimited JSON, as they come off the partial ranking."""
+    profile = matching.course_vectors[method].profiles([course_codes])
+    ranked = matching.job_indexes[method].iter_top_job_indices(profile, top_n)
+    end = None if limit is None else offset + limit
+    for row, _ in islice(ranked, offset, end):
+        job = job_response(matching.job_descriptions[row])
+        yield serialize(project([job], fields)[0]) + b"\n"
+
+
+class CourseProfile(BaseModel):
+    courses: list[str]
+    weights: list[float] | None = None
+
+
+class BatchArgs(BaseModel):
+    profiles: list[CourseProfile]
+    top_n: int = 5
+    method: Literal["lda", "tfidf"] = "lda"
+
+
+@router.post("/find_jobs_batch")
+async def find_jobs_batch(batchargs: BatchArgs):
+    """Find top N jobs for each of several course profiles in one pass."""
+    for profile in batchargs.profiles:
+        if profile.weights is not None and len(profile.weights) != len(profile.courses):
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Each profile needs one weight per course"},
+            )
+    matching = current_matching()
 
     try:
-        # Filter selected courses
-        selected_course_codes = courses.split(",")
-        selected_courses = [
-            course for course in course_data if course["Code"] in selected_course_codes
-        ]
-
-        # Extract descriptions for matching
-        course_descriptions = [course["Description"] for course in selected_courses]
-        job_descriptions = extract_job_descriptions(job_data)
-
-        # Perform comparison and find top jobs
-        top_jobs = find_top_n_jobs_lda(
-            course_descriptions, job_descriptions, [1] * len(selected_courses), top_n
+        ranked = await rank_jobs(
+            matching,
+            batchargs.method,
+            [profile.courses for profile in batchargs.profiles],
+            [profile.weights for profile in batchargs.profiles],
+            batchargs.top_n,
         )
+        with stage("json_encode"):
+            return JSONResponse(
+                content=[
+                    [job_response(matching.job_descriptions[row]) for row in job_rows]
+                    for job_rows, _ in ranked
+                ]
+            )
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@router.get("/index_info")
+async def index_info():
+    """Report which corpus version each matching index was built from."""
+    matching = current_matching()
+    return {method: index.manifest for method, index in matching.job_indexes.items()}
+
+
+@router.get("/cache_stats")
+async def cache_stats():
+    """Report hit, miss and eviction counts of the find_jobs result cache."""
+    return result_cache.stats()
 
-        return [
-            {
-                "title": job[0]["Title"],
-                "description": job[0]["Description"],
-                "employer": job[0]["Employer"],
-                "location": job[0]["Location"],
-                "url": job[0]["URL"],
-            }
-            for job in top_jobs
-        ]
+
+@router.get("/skill_gap")
+async def skill_gap(
+    courses: str = Query(...),
+    skills: str = Query(""),
+    top_n: int = Query(5),
+    top_skills: int = Query(10),
+    method: str = Query("lda", pattern="^(lda|tfidf)$"),
+    session: str = Cookie(None),
+):
+    """Find the skills missing for the top N jobs and the most in-demand skills."""
+    matching = current_matching()
+    skill_incidence = matching.skill_incidence
+
+    try:
+        selected_course_codes = list(dict.fromkeys(courses.split(",")))
+        # Signed-in users' skills come from their profile; skills= is for anonymous requests
+        user = database.get_user_by_session(session)
+        if user is not None:
+            user_skills = user.skills
+        else:
+            user_skills = [skill for skill in skills.split(",") if skill]
+        covered = skill_incidence.covered(selected_course_codes, user_skills)
+
+        ranked = await rank_jobs(matching, method, [selected_course_codes], [None], top_n)
+        job_rows, _ = ranked[0]
+        missing = skill_incidence.missing(job_rows, covered)
+
+        response = {
+            "jobs": [
+                {
+                    **job_response(matching.job_descriptions[row]),
+                    "skills": matching.job_descriptions[row]["Skills"],
+                    "missing_skills": job_missing,
+                }
+                for row, job_missing in zip(job_rows, missing)
+            ],
+            "in_demand": [
+                {
+                    "skill": skill,
+                    "jobs": count,
+                    "covered": bool(covered[skill_incidence.skill_columns[skill]]),
+                }
+                for skill, count in skill_incidence.in_demand(top_skills)
+            ],
+        }
+        with stage("json_encode"):
+            return JSONResponse(content=response)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@router.get("/pool_stats")
+async def pool_stats():
+    """Report queue depth and task timings of the matching worker pool."""
+    matching = current_matching()
+    if matching.pool is None:
+        return {"workers": 0}
+    return matching.pool.stats()
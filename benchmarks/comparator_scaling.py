@@ -0,0 +1,205 @@
+"""
+    Time and memory of the comparator stages on synthetic corpora of increasing size.
+
+    Usage: python -m benchmarks.comparator_scaling [--scales 10000,100000,1000000] [--out report.json]
+           python -m benchmarks.comparator_scaling --compare baseline.json report.json
+"""
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+import sklearn
+
+from benchmarks.synthetic_corpus import SyntheticCorpus
+from utils.comparator import (deduplicate_jobs, extract_job_descriptions, find_top_n_jobs_cosine,
+                              find_top_n_jobs_lda, skill_matcher)
+from utils.job_index import CourseVectors, LDAJobIndex, TfidfJobIndex
+from utils.near_duplicates import deduplicate_near_jobs
+
+TOP_N = 10
+QUERIES = 100
+
+# Stage whose output each stage consumes
+PREREQUISITES = {
+    'deduplicate_near_jobs': 'deduplicate_jobs',
+    'find_top_n_jobs_cosine': 'extract_job_descriptions',
+    'find_top_n_jobs_lda': 'extract_job_descriptions',
+    'tfidf_index_build': 'extract_job_descriptions',
+    'tfidf_query': 'tfidf_index_build',
+    'lda_index_build': 'extract_job_descriptions',
+    'lda_query': 'lda_index_build',
+}
+
+
+def required_stages(selected):
+    required = set()
+    for stage in selected:
+        while stage is not None and stage not in required:
+            required.add(stage)
+            stage = PREREQUISITES.get(stage)
+    return required
+
+
+def stages(jobs, courses, query_sets):
+    """
+    Yield (stage name, callable) pairs; each callable runs one stage on the shared inputs.
+    """
+    state = {}
+    descriptions = [course['Description'] for course in courses]
+
+    def deduplicate():
+        state['unique'] = deduplicate_jobs(jobs)
+
+    def deduplicate_near():
+        deduplicate_near_jobs(state['unique'])
+
+    def extract():
+        # Tag every posting from scratch, as a cold server would
+        skill_matcher.match.cache_clear()
+        state['job_descriptions'] = extract_job_descriptions(jobs)
+
+    def legacy_cosine():
+        find_top_n_jobs_cosine(descriptions[:5], state['job_descriptions'], [1] * 5, TOP_N)
+
+    def legacy_lda():
+        find_top_n_jobs_lda(descriptions[:5], state['job_descriptions'], [1] * 5, TOP_N)
+
+    def build(index_type):
+        def run():
+            index = index_type.build(state['job_descriptions'])
+            state[index_type.name] = index, CourseVectors.build(index.name, index.transform, courses, index.version)
+        return run
+
+    def query(name):
+        def run():
+            index, course_vectors = state[name]
+            for codes in query_sets:
+                index.top_n_job_indices(course_vectors.profiles([codes]), TOP_N)
+        return run
+
+    yield 'deduplicate_jobs', deduplicate
+    yield 'deduplicate_near_jobs', deduplicate_near
+    yield 'extract_job_descriptions', extract
+    yield 'find_top_n_jobs_cosine', legacy_cosine
+    yield 'find_top_n_jobs_lda', legacy_lda
+    yield 'tfidf_index_build', build(TfidfJobIndex)
+    yield 'tfidf_query', query(TfidfJobIndex.name)
+    yield 'lda_index_build', build(LDAJobIndex)
+    yield 'lda_query', query(LDAJobIndex.name)
+
+
+def measure(run, memory):
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run_scale(corpus, n_jobs, n_courses, selected, memory, seed):
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    jobs = corpus.jobs(n_jobs)
+    courses = corpus.courses(n_courses)
+    print(f"Generated {n_jobs} jobs and {n_courses} courses in {time.perf_counter() - start:.1f}s.")
+    codes = [course['Code'] for course in courses]
+    query_sets = [list(rng.choice(codes, size=5, replace=False)) for _ in range(QUERIES)]
+
+    required = required_stages(selected)
+    results = []
+    for name, run in stages(jobs, courses, query_sets):
+        if selected and name not in selected:
+            # Still produce the inputs of the selected stages, untimed
+            if name in required:
+                run()
+            continue
+        # Time without tracing, then rerun under tracemalloc, which slows Python-heavy stages
+        seconds, _ = measure(run, memory=False)
+        peak = measure(run, memory=True)[1] if memory else None
+        result = {'scale': n_jobs, 'stage': name, 'seconds': seconds, 'peak_bytes': peak}
+        if name.endswith('_query'):
+            result['seconds_per_query'] = seconds / QUERIES
+        results.append(result)
+        peak_text = f", peak {peak / 2 ** 20:.1f} MiB" if peak is not None else ''
+        print(f"  {name:<26} {seconds:>9.3f}s{peak_text}")
+    return results
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'courses': args.courses_count,
+    }
+
+
+def compare(baseline_path, report_path):
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = {(r['scale'], r['stage']): r for r in json.load(file)['results']}
+    with open(report_path, 'r', encoding='utf-8') as file:
+        report = json.load(file)['results']
+    print(f"{'scale':>9} {'stage':<26} {'baseline s':>11} {'current s':>10} {'ratio':>7} {'peak ratio':>11}")
+    for result in report:
+        before = baseline.get((result['scale'], result['stage']))
+        if before is None:
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] else float('nan')
+        peak_ratio = (result['peak_bytes'] / before['peak_bytes']
+                      if result['peak_bytes'] and before['peak_bytes'] else float('nan'))
+        print(f"{result['scale']:>9} {result['stage']:<26} {before['seconds']:>11.3f} {result['seconds']:>10.3f} "
+              f"{ratio:>7.2f} {peak_ratio:>11.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', default='data/json/adzunaAPI_jobs.json', help="Real corpus to model.")
+    parser.add_argument('--courses', default='data/json/wpi_courses.json', help="Real catalog to model.")
+    parser.add_argument('--scales', default='10000,100000', help="Comma-separated job counts.")
+    parser.add_argument('--courses-count', type=int, default=2000, help="Synthetic courses per scale.")
+    parser.add_argument('--stages', default='', help="Comma-separated stages to run (default: all).")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='comparator_scaling.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'REPORT'),
+                        help="Compare two reports instead of running.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    corpus = SyntheticCorpus.from_files(args.jobs, args.courses, args.seed)
+    selected = {stage for stage in args.stages.split(',') if stage}
+    results = []
+    for scale in (int(scale) for scale in args.scales.split(',')):
+        results.extend(run_scale(corpus, scale, args.courses_count, selected, not args.no_memory, args.seed))
+
+    with open(args.out, 'w', encoding='utf-8') as file:
+        json.dump({'meta': metadata(args), 'results': results}, file, indent=2)
+    print(f"Wrote {args.out}.")
+
+
+if __name__ == '__main__':
+    main()
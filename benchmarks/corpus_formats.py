@@ -0,0 +1,104 @@
+"""
+    Load time and resident memory of the job corpus as JSON versus the memory-mapped columnar format.
+
+    Usage: python -m benchmarks.corpus_formats [--jobs data/json/adzunaAPI_jobs.json] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from utils.columnar import ColumnarTable, read_source, write_table
+from utils.comparator import JOB_COLUMNS
+
+TOP_N = 10
+
+# What each consumer reads: everything, the descriptions to vectorize, the top N jobs to return
+TASKS = ['all_rows', 'comparator_rows', 'descriptions', 'top_n']
+
+
+def resident_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Peak rather than current, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_json(path, task, rows):
+    jobs = read_source(path)
+    if task == 'all_rows':
+        return jobs
+    if task == 'comparator_rows':
+        return [{name: job[name] for name in JOB_COLUMNS} for job in jobs]
+    if task == 'descriptions':
+        return [job['Job Description'] for job in jobs]
+    return [(jobs[row]['Title'], jobs[row]['URL']) for row in rows]
+
+
+def run_columnar(path, task, rows):
+    table = ColumnarTable.open(path)
+    if task == 'all_rows':
+        return list(table.rows())
+    if task == 'comparator_rows':
+        return list(table.rows(JOB_COLUMNS))
+    if task == 'descriptions':
+        return list(table.column('Job Description'))
+    titles, urls = table.column('Title'), table.column('URL')
+    return [(titles[row], urls[row]) for row in rows]
+
+
+def measure(fmt, path, task, rows):
+    """
+    Run one task in this fresh process and return its wall time and resident memory growth.
+    """
+    before = resident_bytes()
+    start = time.perf_counter()
+    result = (run_columnar if fmt == 'columnar' else run_json)(path, task, rows)
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'rss_bytes': resident_bytes() - before, 'items': len(result)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', default='data/json/adzunaAPI_jobs.json', help="Job corpus JSON or CSV file.")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh processes per measurement; the median is kept.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--measure', nargs=3, metavar=('FORMAT', 'PATH', 'TASK'), help=argparse.SUPPRESS)
+    parser.add_argument('--rows', default='', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure, [int(row) for row in args.rows.split(',') if row])))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        table_path = os.path.join(tmp, 'jobs')
+        start = time.perf_counter()
+        table = write_table(read_source(args.jobs), table_path, source=os.path.basename(args.jobs))
+        # The same rows for both formats, picked here so the measured processes do not parse anything extra
+        rows = ','.join(str(row) for row in random.Random(args.seed).sample(range(len(table)), min(TOP_N, len(table))))
+        table_size = sum(entry.stat().st_size for entry in os.scandir(table_path))
+        print(f"Converted {args.jobs} ({os.path.getsize(args.jobs) / 2 ** 20:.2f} MiB) to "
+              f"{table_size / 2 ** 20:.2f} MiB of columns in {time.perf_counter() - start:.2f}s.")
+
+        print(f"{'task':<16} {'format':<9} {'items':>7} {'load ms':>9} {'rss MiB':>8}")
+        for task in TASKS:
+            for fmt, path in (('json', args.jobs), ('columnar', table_path)):
+                # Each run in a new process, so neither format benefits from the other's allocations
+                runs = [json.loads(subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.corpus_formats', '--rows', rows, '--measure', fmt, path, task],
+                    capture_output=True, text=True, check=True).stdout) for _ in range(args.repeat)]
+                seconds = sorted(run['seconds'] for run in runs)[len(runs) // 2]
+                rss = sorted(run['rss_bytes'] for run in runs)[len(runs) // 2]
+                print(f"{task:<16} {fmt:<9} {runs[0]['items']:>7} {1000 * seconds:>9.2f} {rss / 2 ** 20:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
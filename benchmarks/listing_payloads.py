@@ -0,0 +1,65 @@
+"""
+    Payload size and serialization time of course and job listings, full versus paginated and projected.
+
+    Usage: python -m benchmarks.listing_payloads [--repeat 20]
+"""
+import argparse
+import gzip
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.routers.jobs import job_response
+from utils.comparator import extract_job_descriptions
+from utils.course_catalog import CourseCatalog
+from utils.listing import page, project
+
+
+def serialize(payload):
+    # What FastAPI does for a plain return value
+    return JSONResponse(content=jsonable_encoder(payload)).body
+
+
+def measure(payload, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = serialize(payload)
+    elapsed = (time.perf_counter() - start) / repeat
+    return len(body), len(gzip.compress(body)), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', default='data/json/wpi_courses.json')
+    parser.add_argument('--jobs', default='data/json/adzunaAPI_jobs.json')
+    parser.add_argument('--top-n', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.courses, 'r', encoding='utf-8') as file:
+        catalog = CourseCatalog(json.load(file))
+    with open(args.jobs, 'r', encoding='utf-8') as file:
+        jobs = [job_response(job) for job in extract_job_descriptions(json.load(file))[:args.top_n]]
+
+    courses = catalog.department_courses(CourseCatalog.ALL)
+    cases = [
+        ('get_courses All', courses),
+        ('get_courses All fields=code,title', project(courses, ['code', 'title'])),
+        ('get_courses All fields=code,title limit=50', project(page(courses, 0, 50)[0], ['code', 'title'])),
+        (f'find_jobs top_n={len(jobs)}', jobs),
+        (f'find_jobs top_n={len(jobs)} fields=title,employer,location,url',
+         project(jobs, ['title', 'employer', 'location', 'url'])),
+        (f'find_jobs top_n={len(jobs)} fields=title,employer,location,url limit=20',
+         project(page(jobs, 0, 20)[0], ['title', 'employer', 'location', 'url'])),
+    ]
+
+    print(f"{'listing':<66} {'bytes':>10} {'gzip':>9} {'encode ms':>10}")
+    for name, payload in cases:
+        size, compressed, elapsed = measure(payload, args.repeat)
+        print(f"{name:<66} {size:>10,} {compressed:>9,} {1000 * elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+    Load test of the API: boots app.main:app on local blob storage and reports throughput and latency per endpoint.
+
+    Usage: python -m benchmarks.load_test [--concurrency 32] [--duration 30] [--mix find_jobs=4,get_courses=3,...]
+           python -m benchmarks.load_test --url http://host:8000   (an already running server)
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+import numpy as np
+
+DEFAULT_MIX = 'get_departments=2,get_courses=3,find_jobs=4,user_info=1'
+
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(REQUESTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+class Traffic:
+    """
+    Builds realistic requests from the catalog the server actually holds.
+    """
+
+    def __init__(self, departments, course_codes, session, rng):
+        self.departments = departments
+        self.course_codes = course_codes
+        self.session = session
+        self.rng = rng
+
+    def get_departments(self):
+        return '/courses/get_departments', {}, {}
+
+    def get_courses(self):
+        department = 'All' if self.rng.random() < 0.1 else self.rng.choice(self.departments)
+        return '/courses/get_courses', {'department': department}, {}
+
+    def find_jobs(self):
+        # Most students pick a handful of courses; a few pick many
+        n_courses = min(len(self.course_codes), max(1, int(self.rng.lognormvariate(1.4, 0.6))))
+        courses = self.rng.sample(self.course_codes, n_courses)
+        params = {
+            'courses': ','.join(courses),
+            'top_n': self.rng.choice([5, 5, 10, 20]),
+            'method': self.rng.choice(['lda', 'tfidf']),
+        }
+        return '/jobs/find_jobs', params, {}
+
+    def user_info(self):
+        return '/user/info', {}, {'session': self.session}
+
+
+REQUESTS = {
+    'get_departments': Traffic.get_departments,
+    'get_courses': Traffic.get_courses,
+    'find_jobs': Traffic.find_jobs,
+    'user_info': Traffic.user_info,
+}
+
+
+async def wait_ready(client, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get('/ready')).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"Server was not ready within {timeout}s")
+
+
+async def run_worker(client, traffic, names, weights, deadline, record_after, results):
+    while (now := time.perf_counter()) < deadline:
+        name = traffic.rng.choices(names, weights)[0]
+        path, params, cookies = REQUESTS[name](traffic)
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, params=params, cookies=cookies)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if now >= record_after:
+            results[name].append((time.perf_counter() - start, ok))
+
+
+async def run_load(url, concurrency, duration, warmup, mix, session, seed, ready_timeout):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        await wait_ready(client, ready_timeout)
+        departments = (await client.get('/courses/get_departments')).json()
+        courses = (await client.get('/courses/get_courses', params={'department': 'All', 'fields': 'code'})).json()
+        course_codes = [course['code'] for course in courses]
+
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        results = defaultdict(list)
+        start = time.perf_counter()
+        record_after = start + warmup
+        deadline = record_after + duration
+        workers = [
+            run_worker(client, Traffic(departments, course_codes, session, random.Random(seed + i)),
+                       names, weights, deadline, record_after, results)
+            for i in range(concurrency)
+        ]
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - record_after
+    return results, elapsed
+
+
+def report(results, elapsed):
+    print(f"{'endpoint':<16} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = sorted(results.items())
+    everything = [sample for _, samples in rows for sample in samples]
+    for name, samples in rows + [('total', everything)]:
+        if not samples:
+            continue
+        latencies = 1000 * np.array([latency for latency, _ in samples])
+        errors = sum(not ok for _, ok in samples)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{name:<16} {len(samples):>9} {errors:>7} {len(samples) / elapsed:>8.1f} "
+              f"{p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {latencies.max():>8.1f}")
+
+
+def serve(blob_dir, port, session, snapshot_dir):
+    """
+    Run the app on local blob storage, with a load-test user signed in under session (never saved).
+    """
+    # Read by configs, so set before the app is imported
+    os.environ['STORAGE_BACKEND'] = 'local'
+    os.environ['STORAGE_DIR'] = blob_dir
+
+    import uvicorn
+    from app.main import app
+    from app.routers import user
+    from utils.corpus import corpus_loader
+
+    corpus_loader.snapshot_dir = snapshot_dir
+    user.database.add_user(user.DatabaseUser(
+        id=str(uuid.uuid4()), name='Load Test', username=f'loadtest-{session[:8]}', courseIds=[], skills=[],
+        sessions=[session], crediential_id='', public_key='', sign_in_count=0,
+    ))
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help="Load an already running server instead of booting one.")
+    parser.add_argument('--blob-dir', default='data/json', help="Directory served as blob storage.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent clients.")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of measured load.")
+    parser.add_argument('--warmup', type=float, default=5, help="Seconds of unmeasured load first.")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="Relative weights of the endpoints.")
+    parser.add_argument('--session', default=None, help="Session cookie for /user/info on --url servers.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ready-timeout', type=float, default=300)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--snapshot-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.blob_dir, args.port, args.session, args.snapshot_dir)
+        return
+
+    mix = parse_mix(args.mix)
+    session = args.session or uuid.uuid4().hex
+    server = None
+    snapshot_dir = tempfile.TemporaryDirectory()
+    url = args.url
+    if url is None:
+        url = f'http://127.0.0.1:{args.port}'
+        server = subprocess.Popen([
+            sys.executable, '-m', 'benchmarks.load_test', '--serve', '--blob-dir', os.path.abspath(args.blob_dir),
+            '--port', str(args.port), '--session', session, '--snapshot-dir', snapshot_dir.name,
+        ])
+    try:
+        results, elapsed = asyncio.run(run_load(url, args.concurrency, args.duration, args.warmup, mix, session,
+                                                args.seed, args.ready_timeout))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        snapshot_dir.cleanup()
+
+    print(f"{args.concurrency} clients for {elapsed:.1f}s against {url}")
+    report(results, elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+    Synthetic job postings and courses that follow the vocabulary distribution of the real corpus.
+"""
+import json
+from collections import Counter
+
+import numpy as np
+
+
+class TextModel:
+    """
+    Unigram model of a set of texts, with an open-ended Zipfian tail.
+
+    Tokens are drawn from the observed whitespace-split token frequencies,
+    which keeps punctuation and casing (so "C++" and "Python," stay realistic
+    for skill matching). With the probability of seeing a new word in the
+    sample (the share of hapax tokens, by Good-Turing), a token is instead
+    drawn from a Zipf-distributed synthetic vocabulary, so the number of
+    distinct words keeps growing with corpus size as in real text.
+    """
+
+    def __init__(self, texts, zipf_exponent=1.1):
+        counts = Counter(token for text in texts for token in text.split())
+        self.tokens = list(counts)
+        frequencies = np.array(list(counts.values()), dtype=float)
+        self.probabilities = frequencies / frequencies.sum()
+        self.new_word_rate = sum(1 for count in counts.values() if count == 1) / frequencies.sum()
+        self.lengths = np.array([len(text.split()) for text in texts])
+        self.zipf_exponent = zipf_exponent
+
+    def sample(self, n, rng, batch_size=10000):
+        """
+        Return n synthetic texts with lengths drawn from the real ones.
+
+        Token indices are drawn batch_size texts at a time and each text is joined
+        from its own slice, so no per-word array of the whole sample is built.
+        """
+        lengths = rng.choice(self.lengths, size=n)
+        texts = []
+        for start in range(0, n, batch_size):
+            batch_lengths = lengths[start:start + batch_size]
+            total = int(batch_lengths.sum())
+            indices = rng.choice(len(self.tokens), size=total, p=self.probabilities)
+            new = np.flatnonzero(rng.random(total) < self.new_word_rate)
+            # New words get indices past the observed vocabulary, into this batch's list of them
+            indices[new] = len(self.tokens) + np.arange(len(new))
+            vocabulary = self.tokens + [f'w{rank}' for rank in rng.zipf(self.zipf_exponent, size=len(new))]
+            for text_indices in np.split(indices, np.cumsum(batch_lengths)[:-1]):
+                texts.append(' '.join(map(vocabulary.__getitem__, text_indices.tolist())))
+        return texts
+
+
+class SyntheticCorpus:
+    """
+    Generates job postings and courses shaped like adzunaAPI_jobs.json and wpi_courses.json.
+    """
+
+    def __init__(self, jobs, courses, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.job_text = TextModel([job['Job Description'] for job in jobs])
+        self.course_text = TextModel([course['Description'] for course in courses])
+        self.titles = [job['Title'] for job in jobs]
+        self.employers = [job['Employer'] for job in jobs]
+        self.locations = [job['Location'] for job in jobs]
+        self.departments = sorted({course['Department'] for course in courses})
+        # Share of postings that repeat an earlier (title, employer, location)
+        keys = [(job['Title'], job['Employer'], job['Location']) for job in jobs]
+        self.duplicate_rate = 1 - len(set(keys)) / len(keys)
+
+    @classmethod
+    def from_files(cls, jobs_path, courses_path, seed=0):
+        with open(jobs_path, 'r', encoding='utf-8') as file:
+            jobs = json.load(file)
+        with open(courses_path, 'r', encoding='utf-8') as file:
+            courses = json.load(file)
+        return cls(jobs, courses, seed)
+
+    def jobs(self, n):
+        rng = self.rng
+        descriptions = self.job_text.sample(n, rng)
+        jobs = []
+        for i, description in enumerate(descriptions):
+            if jobs and rng.random() < self.duplicate_rate:
+                original = jobs[rng.integers(len(jobs))]
+                title, employer, location = original['Title'], original['Employer'], original['Location']
+            else:
+                # Suffix the title so unrelated postings do not collide by chance at scale
+                title = f"{self.titles[rng.integers(len(self.titles))]} #{i}"
+                employer = self.employers[rng.integers(len(self.employers))]
+                location = self.locations[rng.integers(len(self.locations))]
+            jobs.append({
+                'Title': title,
+                'Job Description': description,
+                'Employer': employer,
+                'Location': location,
+                'URL': f'https://example.com/jobs/{i}',
+                'Minimum Salary': None,
+                'Maximum Salary': None,
+            })
+        return jobs
+
+    def courses(self, n):
+        descriptions = self.course_text.sample(n, self.rng)
+        return [{
+            'Department': self.departments[i % len(self.departments)],
+            'Code': f'SYN {1000 + i}',
+            'Title': f'Synthetic Course {i}',
+            'Description': description,
+        } for i, description in enumerate(descriptions)]
@@ -1,3 +1,5 @@
+import os
+
 # File Paths
 COURSES_FILES = "data/json/wpi_courses.json"  # Update with your file path
 JOB_FILES = "data/json/jobs.json"  # Update with your file path
@@ -17,4 +19,95 @@ NUM_OF_PAGES = 5
 """
 RESULTS_WANTED = 100
 HOURS_OLD = 72
-COUNTRY = "USA"
\ No newline at end of file
+COUNTRY = "USA"
+
+"""
+    Job matching index parameters.
+"""
+INDEX_DIR = "data/index"
+LDA_TOPICS = 5
+RANDOM_SEED = 42
+# Fully refit an index once incrementally added jobs exceed this share of the corpus,
+# or once this share of their tokens falls outside the fitted vocabulary.
+INDEX_REBUILD_FRACTION = 0.25
+INDEX_REBUILD_OOV_RATE = 0.15
+
+"""
+    Approximate nearest-neighbour index parameters for job embeddings.
+"""
+ANN_LISTS = 256  # Inverted lists (k-means cells); roughly sqrt of the corpus size
+ANN_PROBES = 32  # Lists scanned per query; higher is slower but more accurate
+ANN_SUBVECTORS = 48  # One-byte PQ codes per vector; must divide the embedding size
+ANN_RERANK = 10  # Re-rank this many times k candidates exactly; 0 disables
+
+"""
+    On-disk cache of sentence-transformer embeddings.
+"""
+EMBEDDING_CACHE_DIR = "data/embeddings"
+EMBEDDING_FLUSH_ROWS = 1024  # New embeddings buffered in memory before they are written as a shard
+EMBEDDING_MAX_SMALL_SHARDS = 8  # Shards of fewer than this many flushes kept before they are merged
+
+"""
+    In-process cache of find_jobs results.
+"""
+RESULT_CACHE_SIZE = 1024  # Cached course profiles
+RESULT_CACHE_TTL = 3600  # Seconds
+
+"""
+    Matching worker pool.
+"""
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", "0"))  # 0 scores on the event loop; set to the core count in production
+
+"""
+    Corpus loading. The server starts from the local snapshot and refreshes it from storage in the background.
+"""
+CORPUS_BLOBS = ["wpi_courses.json", "adzunaAPI_jobs.json"]
+SNAPSHOT_DIR = "data/snapshot"
+CORPUS_REFRESH_INTERVAL = int(os.getenv("CORPUS_REFRESH_INTERVAL", "300"))  # Seconds between ETag checks; 0 checks once at startup
+CORPUS_RETRY_INTERVAL = 30  # Seconds between retries while no corpus is loaded
+
+"""
+    Metrics.
+"""
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"  # 0 turns pipeline stage timing into a no-op
+
+"""
+    Request profiling. A matching request is profiled when it sends X-Profile: 1 with the admin token, or by sampling.
+"""
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # Unset disables the admin endpoints and header-triggered profiling
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # Share of matching requests profiled
+PROFILE_KEEP = 20  # Slowest profiles kept
+
+"""
+    Blob storage. Azure when AZURE_STORAGE_KEY is set, otherwise the local directory, so everything runs offline.
+"""
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "azure" if os.getenv("AZURE_STORAGE_KEY") else "local")  # azure, local or memory
+STORAGE_DIR = os.getenv("STORAGE_DIR", "data/json")  # Blobs of the local backend
+STORAGE_CACHE_DIR = os.getenv("STORAGE_CACHE_DIR", "data/blob_cache")  # Read-through cache of remote blobs; empty disables
+AZURE_CONTAINER = "scraped-data"
+
+"""
+    Chunked blob transfers. Peak memory is about chunk size x concurrency.
+"""
+TRANSFER_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes per block or range
+TRANSFER_CONCURRENCY = 4  # Blocks or ranges in flight
+
+"""
+    Columnar corpus tables (see utils/columnar.py).
+"""
+COLUMNAR_DIR = "data/columnar"
+
+"""
+    Append-only job store (see utils/job_store.py).
+"""
+JOB_STORE_DIR = "data/jobs"
+JOB_STORE_SEGMENT_SIZE = 64 * 1024 * 1024  # Bytes before appends rotate to a new segment
+
+"""
+    Near-duplicate job detection with MinHash and LSH (see utils/near_duplicates.py).
+"""
+NEAR_DUPLICATE_THRESHOLD = 0.6  # Estimated Jaccard similarity of description shingles; 0 disables detection
+NEAR_DUPLICATE_TITLE_THRESHOLD = 0.7  # Jaccard similarity of title words
+NEAR_DUPLICATE_DESCRIPTION_WORDS = 60  # Leading description words compared, as Adzuna truncates the rest
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32  # 4 rows per band, so pairs from about 0.4 similarity become candidates
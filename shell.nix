@@ -11,7 +11,9 @@ pkgs.mkShell {
         azure-core
         azure-storage-blob
         beautifulsoup4
+        brotli
         fastapi
+        httpx
         numpy
         pandas
         scikit-learn
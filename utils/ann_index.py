@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import time
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import normalize
+
+from configs import ANN_LISTS, ANN_PROBES, ANN_RERANK, ANN_SUBVECTORS, RANDOM_SEED
+
+# Quantizers are trained on a sample of this many points per centroid; the rest are only encoded
+TRAINING_POINTS_PER_CENTROID = 40
+
+
+def _kmeans(vectors, n_clusters, rng):
+    """
+    Train k-means centroids on a random sample of the vectors.
+    """
+    n_clusters = min(n_clusters, len(vectors))
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), n_clusters * TRAINING_POINTS_PER_CENTROID), replace=False)]
+    kmeans = KMeans(n_clusters=n_clusters, n_init=1, max_iter=25, random_state=int(rng.integers(2 ** 31)))
+    return kmeans.fit(sample).cluster_centers_.astype(np.float32)
+
+
+class IVFPQIndex:
+    """
+    Approximate nearest-neighbour index over L2-normalised embeddings, ranking
+    by inner product (cosine similarity).
+
+    Vectors are bucketed into n_lists inverted lists by a k-means coarse
+    quantizer, and the residual to their list centroid is compressed with
+    product quantization into n_subvectors one-byte codes. A query scans only
+    the n_probe closest lists, scoring candidates from a per-query lookup
+    table, then optionally re-ranks the best rerank x k candidates exactly.
+
+    Raising n_probe and rerank trades latency for recall; search_exact is the
+    brute-force fallback used to validate them.
+    """
+
+    def __init__(self, centroids, codebooks, codes, ids, list_offsets, vectors=None, params=None):
+        self.centroids = centroids
+        self.codebooks = codebooks
+        self.codes = codes
+        self.ids = ids
+        self.list_offsets = list_offsets
+        self.vectors = vectors
+        self.params = params or {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, embeddings, n_lists=ANN_LISTS, n_subvectors=ANN_SUBVECTORS, keep_vectors=True,
+              random_state=RANDOM_SEED):
+        """
+        Train the quantizers on the embeddings and encode every vector.
+        """
+        start = time.perf_counter()
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32))
+        n, dim = vectors.shape
+        if dim % n_subvectors:
+            raise ValueError(f"Embedding size {dim} is not divisible into {n_subvectors} subvectors.")
+
+        rng = np.random.default_rng(random_state)
+        centroids = _kmeans(vectors, n_lists, rng)
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        residuals = vectors - centroids[assignments]
+
+        sub_dim = dim // n_subvectors
+        codebooks = np.zeros((n_subvectors, min(256, n), sub_dim), dtype=np.float32)
+        codes = np.empty((n, n_subvectors), dtype=np.uint8)
+        for m in range(n_subvectors):
+            block = slice(m * sub_dim, (m + 1) * sub_dim)
+            codebooks[m] = _kmeans(residuals[:, block], codebooks.shape[1], rng)
+            # argmin ||r - c||^2 == argmin (||c||^2 - 2 r.c)
+            distances = (codebooks[m] ** 2).sum(axis=1) - 2 * residuals[:, block] @ codebooks[m].T
+            codes[:, m] = np.argmin(distances, axis=1)
+
+        # Store the inverted lists contiguously, in CSR style
+        order = np.argsort(assignments, kind='stable')
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=len(centroids)), out=list_offsets[1:])
+
+        params = {'n': n, 'dim': dim, 'n_lists': len(centroids), 'n_subvectors': n_subvectors,
+                  'random_state': random_state}
+        logging.info(f"Built IVF-PQ index over {n} vectors in {time.perf_counter() - start:.2f}s.")
+        return cls(centroids, codebooks, codes[order], order.astype(np.int64), list_offsets,
+                   vectors if keep_vectors else None, params)
+
+    def search(self, query, k=5, n_probe=ANN_PROBES, rerank=ANN_RERANK):
+        """
+        Return the (ids, scores) of the approximate top k vectors for one query.
+        """
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(1, -1)).ravel()
+        coarse = self.centroids @ query
+        n_probe = min(n_probe, len(self.centroids))
+        probed = np.argpartition(-coarse, n_probe - 1)[:n_probe]
+
+        starts, ends = self.list_offsets[probed], self.list_offsets[probed + 1]
+        sizes = ends - starts
+        if not sizes.sum():
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        rows = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+
+        # q.x ~= q.centroid + sum over subvectors of q_m.codeword_m
+        n_subvectors, _, sub_dim = self.codebooks.shape
+        table = np.einsum('md,mkd->mk', query.reshape(n_subvectors, sub_dim), self.codebooks)
+        scores = np.repeat(coarse[probed], sizes) + table[np.arange(n_subvectors), self.codes[rows]].sum(axis=1)
+
+        shortlist = min(len(rows), k * rerank if rerank and self.vectors is not None else k)
+        best = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        ids, scores = self.ids[rows[best]], scores[best]
+
+        if rerank and self.vectors is not None:
+            scores = self.vectors[ids] @ query
+
+        top = np.argsort(-scores)[:k]
+        return ids[top], scores[top]
+
+    def search_exact(self, query, k=5):
+        """
+        Brute-force top k by exact cosine similarity against every stored vector.
+        """
+        if self.vectors is None:
+            raise ValueError("Exact search needs an index built with keep_vectors=True.")
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(1, -1)).ravel()
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def recall(self, queries, k=10, **search_params):
+        """
+        Measure recall@k and mean latency of search against search_exact.
+        """
+        hits = 0
+        elapsed = 0.0
+        for query in queries:
+            expected, _ = self.search_exact(query, k)
+            start = time.perf_counter()
+            found, _ = self.search(query, k, **search_params)
+            elapsed += time.perf_counter() - start
+            hits += len(np.intersect1d(expected, found))
+        return {'recall': hits / (k * len(queries)), 'mean_latency_ms': 1000 * elapsed / len(queries)}
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.savez(os.path.join(path, 'ivfpq.npz'), centroids=self.centroids, codebooks=self.codebooks,
+                 codes=self.codes, ids=self.ids, list_offsets=self.list_offsets)
+        if self.vectors is not None:
+            np.save(os.path.join(path, 'vectors.npy'), self.vectors)
+        with open(os.path.join(path, 'ivfpq.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.params, f, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a saved index; the full vectors, if kept, are memory-mapped.
+        """
+        arrays = np.load(os.path.join(path, 'ivfpq.npz'))
+        vectors_path = os.path.join(path, 'vectors.npy')
+        vectors = np.load(vectors_path, mmap_mode='r') if os.path.isfile(vectors_path) else None
+        with open(os.path.join(path, 'ivfpq.json'), 'r', encoding='utf-8') as f:
+            params = json.load(f)
+        return cls(arrays['centroids'], arrays['codebooks'], arrays['codes'], arrays['ids'], arrays['list_offsets'],
+                   vectors, params)
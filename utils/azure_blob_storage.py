@@ -1,27 +1,16 @@
 import os
 import logging
-from azure.storage.blob import BlobServiceClient
-from azure.core.exceptions import ResourceNotFoundError
 
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
-# Retrieve connection string from environment variable
-CONNECTION_STRING = os.getenv('AZURE_STORAGE_KEY')
-if not CONNECTION_STRING:
-    raise ValueError("Azure Storage connection string is not set.")
+from utils.blob_transfer import download_file, upload_file
 
-CONTAINER_NAME = "scraped-data"
-blob_service_client = BlobServiceClient.from_connection_string(CONNECTION_STRING)
-container_client = blob_service_client.get_container_client(CONTAINER_NAME)
 
 def upload_to_blob(file_path, blob_name):
-    """Upload a file to Azure Blob Storage."""
+    """Upload a file to the configured blob storage in parallel blocks."""
     try:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"The file {file_path} does not exist.")
 
-        with open(file_path, "rb") as data:
-            container_client.upload_blob(name=blob_name, data=data, overwrite=True)
+        upload_file(file_path, blob_name)
         logging.info(f"File {file_path} uploaded as {blob_name}.")
         return f"File {blob_name} uploaded successfully."
     except Exception as e:
@@ -29,14 +18,12 @@ def upload_to_blob(file_path, blob_name):
         return f"Error uploading file: {e}"
 
 def download_from_blob(blob_name, download_path):
-    """Download a file from Azure Blob Storage."""
+    """Download a file from the configured blob storage in parallel ranges, streamed to disk."""
     try:
-        blob_client = container_client.get_blob_client(blob_name)
-        with open(download_path, "wb") as download_file:
-            download_file.write(blob_client.download_blob().readall())
+        download_file(blob_name, download_path)
         logging.info(f"Blob {blob_name} downloaded to {download_path}.")
         return f"File {blob_name} downloaded successfully."
-    except ResourceNotFoundError:
+    except FileNotFoundError:
         logging.error(f"Blob {blob_name} not found.")
         return f"Blob {blob_name} not found."
     except Exception as e:
@@ -47,4 +34,4 @@ def download_from_blob(blob_name, download_path):
 #
 # def main():
 #     # upload_to_blob("data/adzunaAPI_jobs.json", "adzunaAPI_jobs.json" )
-#     download_from_blob("adzunaAPI_jobs.json", "data/test")
\ No newline at end of file
+#     download_from_blob("adzunaAPI_jobs.json", "data/test")
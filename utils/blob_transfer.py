@@ -0,0 +1,161 @@
+import argparse
+import base64
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from configs import TRANSFER_CHUNK_SIZE, TRANSFER_CONCURRENCY
+from utils.storage import BlobChangedError, get_storage
+
+MIB = 2 ** 20
+
+
+class TransferProgress:
+    """
+    Counts the bytes moved by a transfer's threads and logs progress and throughput.
+
+    callback(done, total) is called after every chunk; the log line is written at
+    most once per interval.
+    """
+
+    def __init__(self, label, total, callback=None, interval=2.0):
+        self.label = label
+        self.total = total
+        self.callback = callback
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self._logged_at = self.start
+        self._lock = threading.Lock()
+
+    def add(self, n_bytes):
+        with self._lock:
+            self.done += n_bytes
+            done = self.done
+            now = time.perf_counter()
+            log = now - self._logged_at >= self.interval
+            if log:
+                self._logged_at = now
+        if log:
+            logging.info(f"{self.label}: {done / MIB:.1f}/{self.total / MIB:.1f} MiB "
+                         f"({100 * done / max(self.total, 1):.0f}%), {done / MIB / (now - self.start):.1f} MiB/s")
+        if self.callback is not None:
+            self.callback(done, self.total)
+
+    def finish(self, **info):
+        seconds = time.perf_counter() - self.start
+        throughput = self.done / seconds if seconds else 0.0
+        logging.info(f"{self.label}: {self.done / MIB:.1f} MiB in {seconds:.2f}s ({throughput / MIB:.1f} MiB/s).")
+        return {'bytes': self.done, 'seconds': seconds, 'bytes_per_second': throughput, **info}
+
+
+def block_id(index):
+    # Block IDs must all have the same length within a blob
+    return base64.b64encode(f'{index:08d}'.encode('ascii')).decode('ascii')
+
+
+def run_bounded(function, tasks, concurrency):
+    """
+    Call function(*task) for every task on concurrency threads.
+
+    Tasks are pulled from the iterator only when a thread is free, so a generator
+    that reads a chunk per task holds at most concurrency chunks at once.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+        try:
+            for task in tasks:
+                pending.add(executor.submit(function, *task))
+                if len(pending) >= concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+            for future in pending:
+                future.result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+
+def upload_file(file_path, blob_name, storage=None, chunk_size=TRANSFER_CHUNK_SIZE,
+                concurrency=TRANSFER_CONCURRENCY, progress=None):
+    """
+    Upload a file as blocks of chunk_size, concurrency at a time, and return the transfer stats.
+    """
+    storage = storage or get_storage()
+    tracker = TransferProgress(f"Upload {file_path} -> {blob_name}", os.path.getsize(file_path), progress)
+    block_ids = []
+
+    def stage(block, data):
+        storage.stage_block(blob_name, block, data)
+        tracker.add(len(data))
+
+    with open(file_path, 'rb') as file:
+        def blocks():
+            while data := file.read(chunk_size):
+                block_ids.append(block_id(len(block_ids)))
+                yield block_ids[-1], data
+
+        run_bounded(stage, blocks(), concurrency)
+    etag = storage.commit_blocks(blob_name, block_ids)
+    return tracker.finish(blocks=len(block_ids), etag=etag)
+
+
+def download_file(blob_name, file_path, storage=None, chunk_size=TRANSFER_CHUNK_SIZE,
+                  concurrency=TRANSFER_CONCURRENCY, progress=None):
+    """
+    Download a blob in ranges of chunk_size, concurrency at a time, and return the transfer stats.
+
+    Every range is read against the ETag seen at the start, so a blob rewritten
+    mid-download raises BlobChangedError instead of producing a mixed file. The
+    file only appears at file_path once it is complete.
+    """
+    storage = storage or get_storage()
+    etag, size = storage.stat(blob_name)
+    tracker = TransferProgress(f"Download {blob_name} -> {file_path}", size, progress)
+
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    part_path = file_path + '.part'
+    with open(part_path, 'wb') as file:
+        file.truncate(size)
+    fd = os.open(part_path, os.O_WRONLY)
+
+    def fetch(offset):
+        length = min(chunk_size, size - offset)
+        data = storage.read_range(blob_name, offset, length, etag)
+        if len(data) != length:
+            raise BlobChangedError(f"Blob {blob_name} changed during the transfer.")
+        os.pwrite(fd, data, offset)
+        tracker.add(length)
+
+    try:
+        run_bounded(fetch, ((offset,) for offset in range(0, size, chunk_size)), concurrency)
+    except BaseException:
+        os.close(fd)
+        os.remove(part_path)
+        raise
+    os.close(fd)
+    os.replace(part_path, file_path)
+    return tracker.finish(etag=etag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload or download a large blob in parallel chunks.")
+    parser.add_argument('direction', choices=['upload', 'download'])
+    parser.add_argument('file', help="Local file to upload from or download to.")
+    parser.add_argument('blob', help="Blob name in the configured storage.")
+    parser.add_argument('--chunk-size', type=int, default=TRANSFER_CHUNK_SIZE // MIB, help="Chunk size in MiB.")
+    parser.add_argument('--concurrency', type=int, default=TRANSFER_CONCURRENCY, help="Chunks in flight.")
+    args = parser.parse_args()
+
+    transfer = upload_file if args.direction == 'upload' else download_file
+    source, destination = (args.file, args.blob) if args.direction == 'upload' else (args.blob, args.file)
+    stats = transfer(source, destination, chunk_size=args.chunk_size * MIB, concurrency=args.concurrency)
+    print(f"{stats['bytes'] / MIB:.1f} MiB in {stats['seconds']:.2f}s ({stats['bytes_per_second'] / MIB:.1f} MiB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from configs import COLUMNAR_DIR
+
+MANIFEST_NAME = 'manifest.json'
+# Bump whenever the on-disk layout of a table changes.
+COLUMNAR_FORMAT_VERSION = 2
+
+
+class StringColumn:
+    """
+    Strings stored end to end as UTF-8, with row i at data[offsets[i]:offsets[i + 1]].
+
+    Both arrays are memory-mapped, so only the rows that are read are paged in.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        # Iterating touches every row anyway, so copy the column once rather than slicing the map per row
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield data[start:end].decode('utf-8')
+
+
+# Stands in for a key that a record does not have
+_ABSENT = object()
+
+
+class ColumnarTable:
+    """
+    A table of string, integer, float and JSON-encoded columns saved as .npy files per column.
+
+    Columns are opened lazily with np.load(mmap_mode='r'), so a reader that only
+    needs descriptions, or only the titles and URLs of the top N jobs, never
+    reads the other columns from disk. Boolean masks next to a column mark the
+    rows where it is None ('nulls') or where the record had no such key
+    ('absent'), so rows come back exactly as they were written.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.columns = [column['name'] for column in manifest['columns']]
+        self._specs = {column['name']: column for column in manifest['columns']}
+        self._open = {}
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        if manifest.get('format_version') != COLUMNAR_FORMAT_VERSION:
+            raise ValueError(f"{path} has columnar format {manifest.get('format_version')}, "
+                             f"expected {COLUMNAR_FORMAT_VERSION}; convert the corpus again.")
+        return cls(path, manifest)
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def _load(self, name, suffix):
+        return np.load(os.path.join(self.path, self._specs[name]['file'] + suffix), mmap_mode='r')
+
+    def column(self, name):
+        """
+        Return a StringColumn (of JSON text for 'json' columns), or an int64 or float64 array.
+
+        Rows that are None or absent hold an arbitrary value; see mask().
+        """
+        if name not in self._open:
+            if self._specs[name]['kind'] in ('int', 'float'):
+                self._open[name] = self._load(name, '.npy')
+            else:
+                self._open[name] = StringColumn(self._load(name, '.offsets.npy'), self._load(name, '.data.npy'))
+        return self._open[name]
+
+    def mask(self, name, which):
+        """
+        Return the boolean 'nulls' or 'absent' mask of a column, or None if no row is marked.
+        """
+        if not self._specs[name].get(which):
+            return None
+        if (name, which) not in self._open:
+            self._open[name, which] = self._load(name, f'.{which}.npy')
+        return self._open[name, which]
+
+    def row(self, index, columns=None):
+        values = {name: self._value(name, index) for name in columns or self.columns}
+        return {name: value for name, value in values.items() if value is not _ABSENT}
+
+    def _value(self, name, index):
+        absent = self.mask(name, 'absent')
+        if absent is not None and absent[index]:
+            return _ABSENT
+        nulls = self.mask(name, 'nulls')
+        if nulls is not None and nulls[index]:
+            return None
+        return self._decode(name, [self.column(name)[index]])[0]
+
+    def _decode(self, name, values):
+        kind = self._specs[name]['kind']
+        if kind in ('int', 'float'):
+            return np.asarray(values).tolist()
+        if kind == 'json':
+            return [json.loads(value) for value in values]
+        return values
+
+    def _values(self, name):
+        values = self.column(name) if self._specs[name]['kind'] == 'str' else self._decode(name, self.column(name))
+        nulls = self.mask(name, 'nulls')
+        absent = self.mask(name, 'absent')
+        if nulls is None and absent is None:
+            return values
+        values = list(values)
+        for mask, marker in ((nulls, None), (absent, _ABSENT)):
+            if mask is not None:
+                for index in np.flatnonzero(mask).tolist():
+                    values[index] = marker
+        return values
+
+    def rows(self, columns=None):
+        """
+        Iterate over the rows as dicts holding only the given columns, in the shape of the source records.
+        """
+        columns = list(columns or self.columns)
+        values = [self._values(name) for name in columns]
+        if not any(self._specs[name].get('absent') for name in columns):
+            for row in zip(*values):
+                yield dict(zip(columns, row))
+            return
+        for row in zip(*values):
+            yield {name: value for name, value in zip(columns, row) if value is not _ABSENT}
+
+
+# Integers that fit, so a column of them can be saved as int64
+INT64_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def _column_kind(values):
+    """
+    Pick the narrowest kind that gives every value back unchanged, ignoring None.
+    """
+    present = [value for value in values if value is not None]
+    if all(type(value) is int and value in INT64_RANGE for value in present):
+        return 'int'
+    if all(type(value) is float for value in present):
+        return 'float'
+    if all(isinstance(value, str) for value in present):
+        return 'str'
+    # Mixed columns, such as salaries with the odd 'N/A', keep each value's type as JSON text
+    return 'json'
+
+
+def write_table(records, path, source=None):
+    """
+    Save a list of flat dicts as a columnar table, replacing any table already at path.
+
+    Reading the table back gives the same dicts: integers stay integers, and
+    keys a record did not have stay absent rather than becoming None.
+    """
+    columns = []
+    for record in records:
+        for name in record:
+            if name not in columns:
+                columns.append(name)
+
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    specs = []
+    for i, name in enumerate(columns):
+        values = [record.get(name) for record in records]
+        kind = _column_kind(values)
+        spec = {'name': name, 'kind': kind, 'file': f'c{i}'}
+        save = lambda suffix, array: np.save(os.path.join(tmp_path, spec['file'] + suffix), array)
+        absent = np.array([name not in record for record in records], dtype=bool)
+        nulls = np.array([value is None for value in values], dtype=bool) & ~absent
+        if kind == 'json':
+            # JSON text holds None itself
+            nulls[:] = False
+        for which, mask in (('nulls', nulls), ('absent', absent)):
+            if mask.any():
+                spec[which] = True
+                save(f'.{which}.npy', mask)
+
+        if kind in ('int', 'float'):
+            save('.npy', np.array([0 if value is None else value for value in values],
+                                  dtype=np.int64 if kind == 'int' else np.float64))
+        else:
+            if kind == 'json':
+                values = [json.dumps(value, ensure_ascii=False) for value in values]
+            else:
+                values = ['' if value is None else value for value in values]
+            encoded = [value.encode('utf-8') for value in values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            save('.offsets.npy', offsets)
+            save('.data.npy', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        specs.append(spec)
+
+    manifest = {
+        'format_version': COLUMNAR_FORMAT_VERSION,
+        'rows': len(records),
+        'columns': specs,
+        'source': source,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    with open(os.path.join(tmp_path, MANIFEST_NAME), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return ColumnarTable(path, manifest)
+
+
+def _parse_number(value, number_type):
+    try:
+        return number_type(value)
+    except ValueError:
+        return value
+
+
+def read_source(path):
+    """
+    Read the records of a JSON array or CSV file.
+
+    CSV columns whose every non-empty cell is an integer are read as ints, those
+    whose every non-empty cell is a number as floats, with empty cells as None.
+    """
+    if path.endswith('.csv'):
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            records = list(csv.DictReader(file))
+        for name in records[0] if records else []:
+            values = [record[name] for record in records if record[name] != '']
+            for number_type in (int, float):
+                if all(isinstance(_parse_number(value, number_type), number_type) for value in values):
+                    for record in records:
+                        record[name] = _parse_number(record[name], number_type) if record[name] != '' else None
+                    break
+        return records
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def iter_records(path, columns=None):
+    """
+    Iterate over the records of a columnar table directory, or of a JSON/CSV file.
+
+    A table only maps the given columns and builds each row as it is reached;
+    files are parsed in full.
+    """
+    if os.path.isdir(path):
+        return ColumnarTable.open(path).rows(columns)
+    return iter(read_source(path))
+
+
+def read_records(path, columns=None):
+    """
+    Read the records of a columnar table directory, or of a JSON/CSV file, into a list.
+
+    For small corpora such as the course catalog; stream large ones with iter_records().
+    """
+    return list(iter_records(path, columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a JSON or CSV corpus to the columnar format.")
+    parser.add_argument('source', help="JSON array or CSV file.")
+    parser.add_argument('out', nargs='?', help=f"Directory to write the table to (default: under {COLUMNAR_DIR}).")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(COLUMNAR_DIR, os.path.splitext(os.path.basename(args.source))[0])
+    table = write_table(read_source(args.source), out, source=os.path.basename(args.source))
+    kinds = ', '.join(f"{column['name']} ({column['kind']})" for column in table.manifest['columns'])
+    print(f"{len(table)} rows written to {out}: {kinds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 import json
+from bisect import bisect_left
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.preprocessing import normalize
+
+from configs import NEAR_DUPLICATE_THRESHOLD
+from utils.metrics import stage, timed
+from utils.near_duplicates import deduplicate_near_jobs
+from utils.skill_matcher import SkillMatcher
 
 TECHNICAL_SKILLS = [
     # Programming Languages and Tools
@@ -39,6 +47,8 @@ TECHNICAL_SKILLS = [
     "Curriculum Development", "Mentoring", "Educational Technology"
 ]
 
+skill_matcher = SkillMatcher(TECHNICAL_SKILLS)
+
 def load_data():
     with open('../data/json/wpi_courses.json', 'r', encoding='utf-8') as course_file:
         courses = json.load(course_file)
@@ -61,15 +71,30 @@ def deduplicate_jobs(jobs):
             unique_jobs.append(job)
     return unique_jobs
 
-def extract_dept_courses(courses, codes):
+def index_courses_by_code(courses):
+    """
+    Sort courses by code so every course whose code starts with a given prefix can be found by bisection.
+    """
+    courses = sorted(courses, key=lambda course: course['Code'])
+    return [course['Code'] for course in courses], courses
+
+def lookup_courses(course_index, code):
+    """
+    Return the courses whose code starts with code (e.g. 'CS 2102', or 'CS' for the whole department).
+    """
+    codes, courses = course_index
+    return courses[bisect_left(codes, code):bisect_left(codes, code + '\U0010ffff')]
+
+def extract_dept_courses(courses, codes, course_index=None):
     """
     Extract unique course descriptions based on course codes.
     """
+    course_index = course_index or index_courses_by_code(courses)
     descs = []
     added_descriptions = set()
 
     for code in codes:
-        matched_courses = [course['Description'] for course in courses if course['Code'].startswith(code)]
+        matched_courses = [course['Description'] for course in lookup_courses(course_index, code)]
 
         if not matched_courses:
             print(f"No course for code '{code}'.")
@@ -81,29 +106,114 @@ def extract_dept_courses(courses, codes):
 
     return descs
 
+# The job corpus columns extract_job_descriptions() reads
+JOB_COLUMNS = ['Title', 'Job Description', 'Employer', 'Location', 'URL']
+
+@timed('extract_job_descriptions')
 def extract_job_descriptions(jobs):
     """
     Extract relevant job descriptions containing at least one technical skill.
     """
     jobs = deduplicate_jobs(jobs)
+    # The same posting syndicated by several sites, under slightly different titles or truncated
+    if NEAR_DUPLICATE_THRESHOLD:
+        with stage('near_duplicates'):
+            jobs = deduplicate_near_jobs(jobs)
     job_descriptions = []
     for job in jobs:
-        if any(skill.lower() in job['Job Description'].lower() for skill in TECHNICAL_SKILLS):
+        skills = skill_matcher.match(job['Job Description'])
+        if skills:
             job_descriptions.append({
                 'Title': job['Title'],
                 'Description': job['Job Description'],
                 'Employer': job['Employer'],
                 'Location': job['Location'],
-                'URL': job['URL']
+                'URL': job['URL'],
+                'Skills': sorted(skills)
             })
     return job_descriptions
 
+def profile_matrix(course_vectors, course_weight_sets):
+    """
+    Stack one course profile per course set into a (profiles x features) matrix.
+
+    A profile is the weighted mean of its courses' L2-normalised rows, so its
+    score against a job is the weighted mean cosine similarity of the courses.
+    course_vectors holds the courses of every set back to back, in the same
+    order as course_weight_sets.
+    """
+    sizes = np.array([len(weights) for weights in course_weight_sets], dtype=int)
+    if not sizes.sum():
+        return sparse.csr_matrix((len(sizes), course_vectors.shape[1]))
+    weights = np.concatenate([np.asarray(w, dtype=float) for w in course_weight_sets])
+
+    # Sparse (profiles x courses) matrix of each profile's weights, scaled to sum to one
+    rows = np.repeat(np.arange(len(sizes)), sizes)
+    totals = np.bincount(rows, weights=weights, minlength=len(sizes))
+    # Profiles whose weights are all zero are left empty
+    values = weights / np.where(totals == 0, 1, totals)[rows]
+    averaging = sparse.csr_matrix((values, (rows, np.arange(sizes.sum()))), shape=(len(sizes), sizes.sum()))
+    return averaging @ normalize(course_vectors)
+
+def top_n_indices_batch(profiles, job_vectors, top_n=5):
+    """
+    Score every profile against L2-normalised job vectors with one matrix product
+    and return the (job indices, scores) of the top N jobs per profile.
+    """
+    with stage('similarity'):
+        scores = profiles @ job_vectors.T
+        scores = scores.toarray() if sparse.issparse(scores) else np.asarray(scores)
+    top_n = max(min(top_n, scores.shape[1]), 0)
+
+    with stage('sort'):
+        top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n] if top_n else np.empty((len(scores), 0), dtype=int)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    # Profiles with no (non-zero weighted) courses have nothing to match
+    empty = np.asarray(abs(profiles).sum(axis=1)).ravel() == 0
+    return [(top[p][:0], top_scores[p][:0]) if empty[p] else (top[p], top_scores[p]) for p in range(len(top))]
+
+def iter_top_n_indices(scores, top_n, block_size=64):
+    """
+    Yield the (index, score) of the top N scores in descending order, one partially
+    selected block at a time, so the first results do not wait for the full ranking.
+    """
+    candidates = np.arange(len(scores))
+    remaining = min(top_n, len(scores))
+    while remaining > 0:
+        k = min(block_size, remaining)
+        if k < len(candidates):
+            selected = np.argpartition(-scores[candidates], k - 1)
+            block, candidates_left = candidates[selected[:k]], candidates[selected[k:]]
+        else:
+            block, candidates_left = candidates, candidates[:0]
+        for idx in block[np.argsort(-scores[block], kind='stable')]:
+            yield idx, scores[idx]
+        candidates = candidates_left
+        remaining -= k
+        # Grow the blocks, so long rankings cost O(n log top_n) rather than O(n * top_n / block_size)
+        block_size *= 2
+
+def top_n_jobs_batch(profiles, job_vectors, job_descriptions, top_n=5):
+    """
+    Score every profile against L2-normalised job vectors with one matrix product
+    and return the top N (job, score) pairs per profile.
+    """
+    return [
+        [(job_descriptions[idx], score) for idx, score in zip(indices, scores)]
+        for indices, scores in top_n_indices_batch(profiles, job_vectors, top_n)
+    ]
+
 def find_top_n_jobs_cosine(course_descriptions, job_descriptions, course_weights, top_n=5):
     """
     Find top N jobs using cosine similarity with TF-IDF vectors.
     """
     vectorizer = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = vectorizer.fit_transform(course_descriptions + [job['Description'] for job in job_descriptions])
+    with stage('vectorize'):
+        tfidf_matrix = vectorizer.fit_transform(course_descriptions + [job['Description'] for job in job_descriptions])
 
     course_vectors = tfidf_matrix[:len(course_descriptions)]
     job_vectors = tfidf_matrix[len(course_descriptions):]
@@ -111,9 +221,11 @@ def find_top_n_jobs_cosine(course_descriptions, job_descriptions, course_weights
     course_weights = np.array(course_weights).reshape(-1, 1)
     weighted_course_vectors = course_vectors.multiply(course_weights)
 
-    similarity_scores = cosine_similarity(weighted_course_vectors, job_vectors).mean(axis=0)
+    with stage('similarity'):
+        similarity_scores = cosine_similarity(weighted_course_vectors, job_vectors).mean(axis=0)
 
-    top_indices = similarity_scores.argsort()[-top_n:][::-1]
+    with stage('sort'):
+        top_indices = similarity_scores.argsort()[-top_n:][::-1]
     top_jobs = [(job_descriptions[idx], similarity_scores[idx]) for idx in top_indices]
 
     return top_jobs
@@ -123,10 +235,12 @@ def find_top_n_jobs_lda(course_descriptions, job_descriptions, course_weights, t
     Find top N jobs using Latent Dirichlet Allocation (LDA).
     """
     vectorizer = CountVectorizer(stop_words='english')
-    count_matrix = vectorizer.fit_transform(course_descriptions + [job['Description'] for job in job_descriptions])
+    with stage('vectorize'):
+        count_matrix = vectorizer.fit_transform(course_descriptions + [job['Description'] for job in job_descriptions])
 
     lda = LatentDirichletAllocation(n_components=n_topics, random_state=42)
-    lda_matrix = lda.fit_transform(count_matrix)
+    with stage('lda_fit'):
+        lda_matrix = lda.fit_transform(count_matrix)
 
     course_vectors = lda_matrix[:len(course_descriptions)]
     job_vectors = lda_matrix[len(course_descriptions):]
@@ -134,13 +248,44 @@ def find_top_n_jobs_lda(course_descriptions, job_descriptions, course_weights, t
     course_weights = np.array(course_weights).reshape(-1, 1)
     weighted_course_vectors = course_vectors * course_weights
 
-    similarity_scores = cosine_similarity(weighted_course_vectors, job_vectors).mean(axis=0)
+    with stage('similarity'):
+        similarity_scores = cosine_similarity(weighted_course_vectors, job_vectors).mean(axis=0)
 
-    top_indices = similarity_scores.argsort()[-top_n:][::-1]
+    with stage('sort'):
+        top_indices = similarity_scores.argsort()[-top_n:][::-1]
     top_jobs = [(job_descriptions[idx], similarity_scores[idx]) for idx in top_indices]
 
     return top_jobs
 
+def find_top_n_jobs_cosine_batch(course_description_sets, job_descriptions, course_weight_sets, top_n=5):
+    """
+    Find top N jobs for several course sets at once using cosine similarity with TF-IDF vectors.
+    """
+    course_descriptions = [desc for descs in course_description_sets for desc in descs]
+    vectorizer = TfidfVectorizer(stop_words='english')
+    tfidf_matrix = vectorizer.fit_transform(course_descriptions + [job['Description'] for job in job_descriptions])
+
+    course_vectors = tfidf_matrix[:len(course_descriptions)]
+    job_vectors = tfidf_matrix[len(course_descriptions):]
+
+    return top_n_jobs_batch(profile_matrix(course_vectors, course_weight_sets), job_vectors, job_descriptions, top_n)
+
+def find_top_n_jobs_lda_batch(course_description_sets, job_descriptions, course_weight_sets, top_n=5, n_topics=5):
+    """
+    Find top N jobs for several course sets at once using Latent Dirichlet Allocation (LDA).
+    """
+    course_descriptions = [desc for descs in course_description_sets for desc in descs]
+    vectorizer = CountVectorizer(stop_words='english')
+    count_matrix = vectorizer.fit_transform(course_descriptions + [job['Description'] for job in job_descriptions])
+
+    lda = LatentDirichletAllocation(n_components=n_topics, random_state=42)
+    lda_matrix = lda.fit_transform(count_matrix)
+
+    course_vectors = lda_matrix[:len(course_descriptions)]
+    job_vectors = normalize(lda_matrix[len(course_descriptions):])
+
+    return top_n_jobs_batch(profile_matrix(course_vectors, course_weight_sets), job_vectors, job_descriptions, top_n)
+
 def display_top_jobs(top_jobs):
     """
     Display the top jobs.
@@ -170,12 +315,15 @@ def main():
     # Load course and job data
     courses, jobs = load_data()
 
-    # Define course codes and weights
-    course_codes = ['CS 3516', 'CS 2102', 'CS 1101', 'CS 2022', 'CS 2223']  # Example
-    course_weights = [1 if code.startswith('CS') else 0 for code in course_codes if code in {course['Code'] for course in courses}]
+    # Define one course code set per student profile, and the course weights
+    profiles = [
+        ['CS 3516', 'CS 2102', 'CS 1101', 'CS 2022', 'CS 2223'],  # Example
+    ]
+    course_index = index_courses_by_code(courses)
+    course_description_sets = [extract_dept_courses(courses, codes, course_index) for codes in profiles]
+    course_weight_sets = [[1] * len(descs) for descs in course_description_sets]
 
-    # Extract course and job descriptions
-    course_descriptions = extract_dept_courses(courses, course_codes)
+    # Extract job descriptions
     job_descriptions = extract_job_descriptions(jobs)
 
     # Choose similarity method
@@ -183,13 +331,15 @@ def main():
     top_n = 5
 
     if statistical:
-        top_jobs = find_top_n_jobs_lda(course_descriptions, job_descriptions, course_weights, top_n)
+        top_jobs_batch = find_top_n_jobs_lda_batch(course_description_sets, job_descriptions, course_weight_sets, top_n)
     else:
-        top_jobs = find_top_n_jobs_cosine(course_descriptions, job_descriptions, course_weights, top_n)
+        top_jobs_batch = find_top_n_jobs_cosine_batch(course_description_sets, job_descriptions, course_weight_sets, top_n)
 
     # Display the results
-    display_top_jobs(top_jobs)
-    save_top_jobs_to_json(top_jobs)
+    for codes, top_jobs in zip(profiles, top_jobs_batch):
+        print(f"\nTop jobs for {', '.join(codes)}:")
+        display_top_jobs(top_jobs)
+    save_top_jobs_to_json(top_jobs_batch[0])
 
 if __name__ == "__main__":
     main()
@@ -4,6 +4,16 @@ from sentence_transformers import SentenceTransformer
 from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.preprocessing import normalize
+
+from utils.ann_index import IVFPQIndex
+from utils.embedding_cache import EmbeddingCache
+from utils.job_index import CourseVectors
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+_model = None
+_embedding_cache = None
 
 # Define technical skills
 TECHNICAL_SKILLS = [
@@ -87,13 +97,35 @@ def extract_job_descriptions(jobs):
         })
     return job_descriptions
 
+def get_model():
+    """
+    Load the SentenceTransformer model once per process.
+    """
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(EMBEDDING_MODEL)
+    return _model
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(EMBEDDING_MODEL)
+    return _embedding_cache
+
+def embed(texts):
+    """
+    Return normalised embeddings for texts, only encoding texts that are not in the on-disk cache.
+    """
+    return get_embedding_cache().encode(
+        texts, lambda missing: get_model().encode(missing, batch_size=64, normalize_embeddings=True)
+    )
+
 def generate_skills_vector(skills):
     """
     Generate a vector representation of technical skills using SentenceTransformer.
     """
-    model = SentenceTransformer('all-MiniLM-L6-v2')
     skills_text = " ".join(skills)
-    return model.encode(skills_text)
+    return get_model().encode(skills_text)
 
 def combine_descriptions_with_skills(course_descriptions, skills):
     """
@@ -147,6 +179,46 @@ def find_top_n_jobs_lda(course_descriptions, job_descriptions, course_weights, t
     return top_jobs
 
 
+def build_job_embedding_index(job_descriptions, **index_params):
+    """
+    Embed every job description and index the embeddings for approximate search.
+    """
+    return IVFPQIndex.build(embed([job['Description'] for job in job_descriptions]), **index_params)
+
+
+def build_course_embeddings(courses):
+    """
+    Embed every catalog course, keyed by course code.
+    """
+    return CourseVectors.build('embedding', embed, courses, EMBEDDING_MODEL)
+
+
+def evict_stale_embeddings(courses, job_descriptions):
+    """
+    Drop cached embeddings of texts that are no longer in the course catalog or the job corpus.
+    """
+    return get_embedding_cache().retain(
+        [course['Description'] for course in courses] + [job['Description'] for job in job_descriptions]
+    )
+
+
+def find_top_n_jobs_embedding(course_descriptions, job_descriptions, course_weights, job_index, top_n=5,
+                              exact=False, **search_params):
+    """
+    Find top N jobs by cosine similarity of sentence embeddings, searching the
+    approximate job index (or every job, if exact is set).
+    """
+    course_vectors = embed(course_descriptions)
+    course_weights = np.array(course_weights).reshape(-1, 1)
+    query = normalize(course_vectors * course_weights).mean(axis=0)
+
+    if exact:
+        ids, scores = job_index.search_exact(query, top_n)
+    else:
+        ids, scores = job_index.search(query, top_n, **search_params)
+    return [(job_descriptions[idx], score) for idx, score in zip(ids, scores)]
+
+
 def display_top_jobs(top_jobs):
     for idx, (job, score) in enumerate(top_jobs, start=1):
         print(f"\nRank {idx}:")
@@ -183,10 +255,10 @@ def main():
         # Pass combined text descriptions to the LDA-based method
         top_jobs = find_top_n_jobs_lda(combined_descriptions, job_descriptions, course_weights, top_n)
     else:
-        # For cosine similarity, generate embeddings
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        course_vectors = model.encode(combined_descriptions)
-        top_jobs = find_top_n_jobs_cosine(course_vectors, job_descriptions, course_weights, top_n)
+        # For cosine similarity, embed the jobs and search them through the ANN index
+        job_index = build_job_embedding_index(job_descriptions)
+        top_jobs = find_top_n_jobs_embedding(combined_descriptions, job_descriptions, course_weights, job_index, top_n)
+        print(f"Embedding cache: {get_embedding_cache().stats()}")
 
     # Display the results
     display_top_jobs(top_jobs)
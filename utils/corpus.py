@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from configs import CORPUS_BLOBS, CORPUS_REFRESH_INTERVAL, CORPUS_RETRY_INTERVAL, SNAPSHOT_DIR
+from utils.storage import get_storage
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def corpus_version(blobs):
+    """
+    Content address of a set of blobs, so an unchanged corpus keeps its version whatever it was loaded from.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(blobs):
+        digest.update(f"{name}:{blobs[name]['sha256']}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CorpusLoader:
+    """
+    Loads the course catalog and job corpus without blocking server startup.
+
+    start() reads the local snapshot in a background thread, then refreshes it
+    from the configured storage, reading only blobs whose ETag changed. Subscribers
+    are called with the parsed blobs whenever a new corpus version is loaded;
+    the loader is ready once they have all accepted one.
+    """
+
+    def __init__(self, blob_names=CORPUS_BLOBS, snapshot_dir=SNAPSHOT_DIR,
+                 refresh_interval=CORPUS_REFRESH_INTERVAL, retry_interval=CORPUS_RETRY_INTERVAL):
+        self.blob_names = list(blob_names)
+        self.snapshot_dir = snapshot_dir
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.state = 'starting'
+        self.source = None
+        self.version = None
+        self.blobs = {}
+        self.loaded_at = None
+        self.refreshed_at = None
+        self.error = None
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """
+        Register callback(data, version), called with {blob name: parsed JSON} for every new corpus version.
+        """
+        self._subscribers.append(callback)
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='corpus-loader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        return {
+            'ready': self.ready,
+            'state': self.state,
+            'source': self.source,
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'refreshed_at': self.refreshed_at,
+            'error': self.error,
+            'blobs': {name: {key: blob[key] for key in ('etag', 'sha256', 'size')}
+                      for name, blob in self.blobs.items()},
+        }
+
+    def _run(self):
+        self.state = 'loading'
+        try:
+            snapshot = self.read_snapshot()
+            if snapshot is not None:
+                self._publish(snapshot, 'snapshot')
+        except Exception as e:
+            logging.error(f"Error loading corpus snapshot: {e}")
+            self.error = str(e)
+
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Error refreshing corpus from storage: {e}")
+                self.error = str(e)
+                if not self.ready:
+                    self.state = 'failed'
+            # Keep retrying until some corpus is loaded, then refresh on the configured interval
+            interval = self.refresh_interval if self.ready else self.retry_interval
+            if not interval or self._stop.wait(interval):
+                break
+
+    def _publish(self, blobs, source):
+        version = corpus_version(blobs)
+        if version != self.version:
+            start = time.perf_counter()
+            data = {name: json.loads(blob['content']) for name, blob in blobs.items()}
+            for callback in self._subscribers:
+                callback(data, version)
+            self.version = version
+            self.loaded_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            logging.info(f"Loaded corpus {version[:12]} from {source} in {time.perf_counter() - start:.2f}s.")
+        self.blobs = blobs
+        self.source = source
+        self.state = 'ready'
+        self.error = None
+
+    def read_snapshot(self):
+        """
+        Return the blobs saved in the snapshot directory, or None if it is missing or incomplete.
+        """
+        try:
+            with open(os.path.join(self.snapshot_dir, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            logging.info(f"No corpus snapshot in {self.snapshot_dir}.")
+            return None
+
+        blobs = {}
+        for name in self.blob_names:
+            entry = manifest.get(name)
+            path = os.path.join(self.snapshot_dir, name)
+            if entry is None or not os.path.exists(path):
+                return None
+            with open(path, 'rb') as file:
+                content = file.read()
+            # A snapshot interrupted mid-write is ignored rather than served
+            if hashlib.sha256(content).hexdigest() != entry['sha256']:
+                logging.warning(f"Snapshot of {name} does not match its manifest; ignoring the snapshot.")
+                return None
+            blobs[name] = {**entry, 'content': content}
+        return blobs
+
+    def write_snapshot(self, blobs):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        for name, blob in blobs.items():
+            path = os.path.join(self.snapshot_dir, name)
+            with open(path + '.tmp', 'wb') as file:
+                file.write(blob['content'])
+            os.replace(path + '.tmp', path)
+        manifest = {name: {key: value for key, value in blob.items() if key != 'content'}
+                    for name, blob in blobs.items()}
+        path = os.path.join(self.snapshot_dir, MANIFEST_NAME)
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def refresh(self):
+        """
+        Read the blobs whose ETag changed, save them as the new snapshot and load them.
+        """
+        storage = get_storage()
+        blobs = {}
+        for name in self.blob_names:
+            current = self.blobs.get(name)
+            changed = storage.read(name) if current is None else storage.read_if_changed(name, current['etag'])
+            if changed is None:
+                blobs[name] = current
+                continue
+            content, etag = changed
+            blobs[name] = {
+                'etag': etag,
+                'sha256': hashlib.sha256(content).hexdigest(),
+                'size': len(content),
+                'content': content,
+            }
+        self.refreshed_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+        if any(blobs[name] is not self.blobs.get(name) for name in self.blob_names):
+            self.write_snapshot(blobs)
+            self._publish(blobs, 'storage')
+        else:
+            self.state = 'ready'
+            self.error = None
+
+
+corpus_loader = CorpusLoader()
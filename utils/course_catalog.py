@@ -0,0 +1,50 @@
+from collections import defaultdict
+
+from utils.encoded_body import EncodedBody
+
+COURSE_FIELDS = ('code', 'title', 'description', 'department')
+
+
+def course_response(course):
+    return {
+        'code': course['Code'],
+        'title': course['Title'],
+        'description': course['Description'],
+        'department': course['Department'],
+    }
+
+
+class CourseCatalog:
+    """
+    In-memory course catalog, indexed by department.
+
+    Built once per catalog version, so listing a department is a dictionary lookup.
+    The endpoint responses are serialized and compressed here too, not per request.
+    """
+
+    ALL = 'All'
+
+    def __init__(self, course_data, version=None):
+        self.version = version
+        self.courses = [course_response(course) for course in course_data]
+        self.by_department = defaultdict(list)
+        for course in self.courses:
+            self.by_department[course['department']].append(course)
+        self.by_department = dict(self.by_department)
+        self.departments = sorted(self.by_department)
+
+        self.departments_body = EncodedBody(self.departments)
+        self.course_bodies = {department: EncodedBody(courses) for department, courses in self.by_department.items()}
+        self.course_bodies[self.ALL] = EncodedBody(self.courses)
+        self.empty_body = EncodedBody([])
+
+    def department_courses(self, department):
+        """
+        Return the courses of a department, every course for 'All', or [] for an unknown department.
+        """
+        if department == self.ALL:
+            return self.courses
+        return self.by_department.get(department, [])
+
+    def department_body(self, department):
+        return self.course_bodies.get(department, self.empty_body)
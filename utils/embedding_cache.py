@@ -0,0 +1,182 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import unicodedata
+import uuid
+
+import numpy as np
+
+from configs import EMBEDDING_CACHE_DIR, EMBEDDING_FLUSH_ROWS, EMBEDDING_MAX_SMALL_SHARDS
+
+INDEX_FILE = 'index.json'
+
+
+def normalise_text(text):
+    """
+    Normalise unicode and whitespace so trivially different copies of a text share an embedding.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk store of text embeddings.
+
+    Entries are keyed by a hash of the model name and the normalised text, so
+    a course or job is only ever encoded once per model. Vectors live in
+    append-only .npy shards that are memory-mapped on read; index.json maps
+    each key to its (shard, row). Each model gets its own subdirectory.
+
+    New embeddings are held in memory until flush_rows of them are pending, so
+    a stream of small encode() calls does not write a shard and the whole index
+    each time; once max_small_shards shards of fewer than that many batches
+    exist, the next flush merges them into one. Pending embeddings are flushed at exit.
+    """
+
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR, flush_rows=EMBEDDING_FLUSH_ROWS,
+                 max_small_shards=EMBEDDING_MAX_SMALL_SHARDS):
+        self.model_name = model_name
+        self.flush_rows = flush_rows
+        self.max_small_shards = max_small_shards
+        self.cache_dir = os.path.join(cache_dir, model_name.replace('/', '__'))
+        self.entries = {}
+        self.shards = {}
+        self._mmaps = {}
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        if os.path.isfile(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.entries = {key: tuple(location) for key, location in index['entries'].items()}
+            self.shards = index['shards']
+        atexit.register(self.flush)
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\x00{normalise_text(text)}".encode('utf-8')).hexdigest()
+
+    def _shard(self, name):
+        if name not in self._mmaps:
+            self._mmaps[name] = np.load(os.path.join(self.cache_dir, name), mmap_mode='r')
+        return self._mmaps[name]
+
+    def _save_index(self):
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'shards': self.shards, 'entries': self.entries}, f)
+        os.replace(index_path + '.tmp', index_path)
+
+    def _write_shard(self, keys, vectors):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        name = f'shard-{uuid.uuid4().hex}.npy'
+        np.save(os.path.join(self.cache_dir, name), np.asarray(vectors, dtype=np.float32))
+        self.shards[name] = len(keys)
+        for row, key in enumerate(keys):
+            self.entries[key] = (name, row)
+
+    def _vector(self, key):
+        if key in self.pending:
+            return self.pending[key]
+        shard, row = self.entries[key]
+        return self._shard(shard)[row]
+
+    def flush(self):
+        """
+        Write the pending embeddings to disk, merged with the small shards once there are too many of them.
+        """
+        if not self.pending:
+            return
+        keys = list(self.pending)
+        vectors = list(self.pending.values())
+        # Shards smaller than max_small_shards batches are merged together, so the shard count stays bounded
+        small = [name for name, rows in self.shards.items() if rows < self.flush_rows * self.max_small_shards]
+        if len(small) < self.max_small_shards:
+            small = []
+        for name in small:
+            shard = self._shard(name)
+            merged = [key for key, (shard_name, _) in self.entries.items() if shard_name == name]
+            keys.extend(merged)
+            vectors.extend(shard[self.entries[key][1]] for key in merged)
+            del self.shards[name]
+            del self._mmaps[name]
+
+        self._write_shard(keys, np.stack(vectors))
+        self._save_index()
+        self.pending = {}
+        # Only once the index no longer points at them
+        for name in small:
+            os.remove(os.path.join(self.cache_dir, name))
+
+    def encode(self, texts, encode_fn):
+        """
+        Return embeddings for texts, calling encode_fn on the list of texts that
+        are not cached yet (if any).
+        """
+        keys = [self.key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in self.entries or key in self.pending or key in missing:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing[key] = text
+
+        if missing:
+            vectors = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            self.pending.update(zip(missing, vectors))
+            logging.info(f"Encoded {len(missing)} new texts with {self.model_name}.")
+
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        result = np.stack([self._vector(key) for key in keys])
+        # After stacking, since a merging flush drops the memory maps of merged shards
+        if len(self.pending) >= self.flush_rows:
+            self.flush()
+        return result
+
+    def retain(self, texts):
+        """
+        Evict every entry whose text is not among texts (e.g. the current course
+        and job corpus), then compact the surviving vectors into a single shard.
+        """
+        self.flush()
+        live = {self.key(text) for text in texts}
+        dead = [key for key in self.entries if key not in live]
+        if not dead:
+            return 0
+
+        for key in dead:
+            del self.entries[key]
+        keys = list(self.entries)
+        vectors = [self._shard(shard)[row] for shard, row in self.entries.values()]
+        old_shards = list(self.shards)
+
+        self.shards = {}
+        self.entries = {}
+        self._mmaps = {}
+        if keys:
+            self._write_shard(keys, np.stack(vectors))
+        self._save_index()
+        for name in old_shards:
+            os.remove(os.path.join(self.cache_dir, name))
+
+        self.evictions += len(dead)
+        logging.info(f"Evicted {len(dead)} embeddings for documents no longer in the corpus.")
+        return len(dead)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'shards': len(self.shards),
+            'pending': len(self.pending),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+        }
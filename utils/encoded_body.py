@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:  # Optional; without it responses are only gzip-compressed
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+
+def serialize(payload):
+    # Same encoding as FastAPI's JSONResponse
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode('utf-8')
+
+
+def accepted_encodings(accept_encoding):
+    """
+    Parse an Accept-Encoding header into the set of codings the client accepts.
+    """
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class EncodedBody:
+    """
+    A JSON response body serialized once, with compressed variants and strong ETags.
+
+    Each encoding gets its own ETag (its bytes differ), all derived from the
+    content hash, so any of them validates a cached copy of the content.
+    """
+
+    # Preferred first
+    ENCODINGS = ('br', 'gzip')
+
+    def __init__(self, payload):
+        body = serialize(payload)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {'identity': (body, f'"{digest}"')}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed['br'] = brotli.compress(body, quality=11)
+            for encoding, content in compressed.items():
+                if len(content) < len(body):
+                    self.variants[encoding] = (content, f'"{digest}-{encoding}"')
+        self.etags = {etag for _, etag in self.variants.values()}
+
+    def negotiate(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in self.ENCODINGS:
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                return encoding
+        return 'identity'
+
+    def not_modified(self, if_none_match):
+        """
+        Whether an If-None-Match header matches this content, using weak comparison as RFC 9110 requires.
+        """
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return '*' in tags or bool(tags & self.etags)
+
+    def select(self, accept_encoding=None, if_none_match=None):
+        """
+        Return (status code, body, headers) of the response for a request with these headers.
+        """
+        encoding = self.negotiate(accept_encoding)
+        content, etag = self.variants[encoding]
+        headers = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if self.not_modified(if_none_match):
+            return 304, b'', headers
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return 200, content, headers
@@ -0,0 +1,439 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from configs import INDEX_DIR, INDEX_REBUILD_FRACTION, INDEX_REBUILD_OOV_RATE, LDA_TOPICS, RANDOM_SEED
+from utils.columnar import iter_records, read_records
+from utils.comparator import (JOB_COLUMNS, extract_job_descriptions, iter_top_n_indices, profile_matrix,
+                              top_n_indices_batch)
+from utils.metrics import stage
+
+# Bump whenever the on-disk layout of an index changes.
+INDEX_FORMAT_VERSION = 2
+
+
+def corpus_fingerprint(job_descriptions):
+    """
+    Hash the job corpus so an index can be tied to the exact jobs it was built from.
+    """
+    digest = hashlib.sha256()
+    for job in job_descriptions:
+        digest.update(job['URL'].encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(job['Description'].encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def catalog_fingerprint(courses):
+    """
+    Hash the course catalog so precomputed course vectors can be tied to it.
+    """
+    digest = hashlib.sha256()
+    for course in courses:
+        digest.update(course['Code'].encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(course['Description'].encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class JobIndex:
+    """
+    A text model fitted once on the job corpus, together with the precomputed
+    (row-normalised) job matrix that course profiles are scored against.
+
+    Subclasses provide the model-specific fit, transform and matrix storage.
+    """
+
+    name = None
+
+    def __init__(self, model, job_matrix, manifest):
+        self.model = model
+        self.job_matrix = job_matrix
+        self.manifest = manifest
+
+    @property
+    def version(self):
+        return self.manifest['corpus_version']
+
+    @classmethod
+    def _paths(cls, index_dir):
+        return (os.path.join(index_dir, f'{cls.name}_model.joblib'),
+                os.path.join(index_dir, f'{cls.name}_jobs{cls.matrix_suffix}'),
+                os.path.join(index_dir, f'{cls.name}_manifest.json'))
+
+    @classmethod
+    def _manifest(cls, job_descriptions, **params):
+        return {
+            'format_version': INDEX_FORMAT_VERSION,
+            'method': cls.name,
+            'corpus_version': corpus_fingerprint(job_descriptions),
+            'n_jobs': len(job_descriptions),
+            **params,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            # Jobs folded in since the last full build, used to decide when to rebuild
+            'incremental_jobs': 0,
+            'incremental_tokens': 0,
+            'incremental_oov_tokens': 0,
+        }
+
+    def save(self, index_dir=INDEX_DIR):
+        model_path, matrix_path, manifest_path = self._paths(index_dir)
+        os.makedirs(index_dir, exist_ok=True)
+        joblib.dump(self.model, model_path)
+        self._save_matrix(matrix_path, self.job_matrix)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=4)
+        logging.info(f"{self.name} index {self.version[:12]} saved to {index_dir}.")
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR):
+        """
+        Load a saved index, or return None if there is no compatible one on disk.
+        """
+        model_path, matrix_path, manifest_path = cls._paths(index_dir)
+        if not os.path.isfile(manifest_path):
+            return None
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != INDEX_FORMAT_VERSION:
+            logging.warning(f"Ignoring {cls.name} index in {index_dir} with format {manifest.get('format_version')}.")
+            return None
+        return cls(joblib.load(model_path), cls._load_matrix(matrix_path), manifest)
+
+    def transform(self, texts):
+        with stage('vectorize'):
+            return self._job_vectors(self.model['vectorizer'].transform(texts))
+
+    def can_update(self, job_descriptions):
+        """
+        Check whether the corpus only appends jobs to the one this index was built from.
+        """
+        n_jobs = self.manifest['n_jobs']
+        return len(job_descriptions) > n_jobs and corpus_fingerprint(job_descriptions[:n_jobs]) == self.version
+
+    def update(self, job_descriptions):
+        """
+        Fold the jobs appended to the corpus since the last build or update into the index.
+
+        Vectors already in the job matrix are kept as they are; they are only
+        re-projected by the next full rebuild.
+        """
+        start = time.perf_counter()
+        texts = [job['Description'] for job in job_descriptions[self.manifest['n_jobs']:]]
+        vectorizer = self.model['vectorizer']
+        features = vectorizer.transform(texts)
+        self._partial_fit(features, len(job_descriptions))
+        self.job_matrix = self._stack(self.job_matrix, self._job_vectors(features))
+
+        # Words the fitted vocabulary has never seen are silently dropped, so track how many there are
+        analyzer = vectorizer.build_analyzer()
+        tokens = [token for text in texts for token in analyzer(text)]
+        oov_tokens = sum(token not in vectorizer.vocabulary_ for token in tokens)
+
+        self.manifest.update({
+            'corpus_version': corpus_fingerprint(job_descriptions),
+            'n_jobs': len(job_descriptions),
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'incremental_jobs': self.manifest['incremental_jobs'] + len(texts),
+            'incremental_tokens': self.manifest['incremental_tokens'] + len(tokens),
+            'incremental_oov_tokens': self.manifest['incremental_oov_tokens'] + oov_tokens,
+        })
+        logging.info(f"Folded {len(texts)} jobs into {self.name} index in {time.perf_counter() - start:.2f}s.")
+
+    def drift(self):
+        """
+        Return the share of jobs added incrementally and the out-of-vocabulary token rate among them.
+        """
+        incremental_fraction = self.manifest['incremental_jobs'] / max(self.manifest['n_jobs'], 1)
+        oov_rate = self.manifest['incremental_oov_tokens'] / max(self.manifest['incremental_tokens'], 1)
+        return incremental_fraction, oov_rate
+
+    def needs_rebuild(self):
+        incremental_fraction, oov_rate = self.drift()
+        return incremental_fraction > INDEX_REBUILD_FRACTION or oov_rate > INDEX_REBUILD_OOV_RATE
+
+    def top_n_job_indices(self, profiles, top_n=5):
+        """
+        Return the (job row indices, scores) of the top N jobs for each row of a profile matrix
+        (see CourseVectors.profiles).
+        """
+        return top_n_indices_batch(profiles, self.job_matrix, top_n)
+
+    def iter_top_job_indices(self, profile, top_n=5):
+        """
+        Yield the (job row index, score) of the top N jobs for a single profile row, in rank order.
+        """
+        if abs(profile).sum() == 0:
+            return
+        with stage('similarity'):
+            scores = profile @ self.job_matrix.T
+            scores = scores.toarray() if sparse.issparse(scores) else np.asarray(scores)
+        yield from iter_top_n_indices(scores.ravel(), top_n)
+
+
+class LDAJobIndex(JobIndex):
+    """
+    CountVectorizer + LDA topic model with a dense job-topic matrix.
+    """
+
+    name = 'lda'
+    matrix_suffix = '.npy'
+
+    @classmethod
+    def build(cls, job_descriptions, n_topics=LDA_TOPICS, random_state=RANDOM_SEED):
+        """
+        Fit the vectorizer and LDA model on the job corpus.
+        """
+        start = time.perf_counter()
+        vectorizer = CountVectorizer(stop_words='english')
+        with stage('vectorize'):
+            count_matrix = vectorizer.fit_transform([job['Description'] for job in job_descriptions])
+
+        lda = LatentDirichletAllocation(n_components=n_topics, random_state=random_state)
+        with stage('lda_fit'):
+            job_topics = normalize(lda.fit_transform(count_matrix))
+
+        logging.info(f"Built LDA index over {len(job_descriptions)} jobs in {time.perf_counter() - start:.2f}s.")
+        manifest = cls._manifest(job_descriptions, n_topics=n_topics, random_state=random_state)
+        return cls({'vectorizer': vectorizer, 'lda': lda}, job_topics, manifest)
+
+    @staticmethod
+    def _save_matrix(path, matrix):
+        np.save(path, matrix)
+
+    @staticmethod
+    def _load_matrix(path):
+        return np.load(path)
+
+    @staticmethod
+    def _stack(matrix, rows):
+        return np.vstack([matrix, rows])
+
+    def _job_vectors(self, counts):
+        return normalize(self.model['lda'].transform(counts))
+
+    def _partial_fit(self, counts, total_samples):
+        """
+        Run an online variational update of the topics on the new documents.
+        """
+        lda = self.model['lda']
+        lda.total_samples = total_samples
+        with stage('lda_fit'):
+            lda.partial_fit(counts)
+
+
+class TfidfJobIndex(JobIndex):
+    """
+    TF-IDF vocabulary and IDF weights fitted on the job corpus, with the
+    L2-normalised job matrix kept in CSR form so queries are a sparse
+    matrix-vector product.
+    """
+
+    name = 'tfidf'
+    matrix_suffix = '.npz'
+
+    @classmethod
+    def build(cls, job_descriptions):
+        """
+        Fit the TF-IDF vectorizer on the job corpus.
+        """
+        start = time.perf_counter()
+        vectorizer = TfidfVectorizer(stop_words='english', dtype=np.float32)
+        with stage('vectorize'):
+            job_matrix = vectorizer.fit_transform([job['Description'] for job in job_descriptions]).tocsr()
+
+        logging.info(f"Built TF-IDF index over {len(job_descriptions)} jobs in {time.perf_counter() - start:.2f}s.")
+        manifest = cls._manifest(job_descriptions, n_terms=len(vectorizer.vocabulary_))
+        return cls({'vectorizer': vectorizer}, job_matrix, manifest)
+
+    @staticmethod
+    def _save_matrix(path, matrix):
+        sparse.save_npz(path, matrix)
+
+    @staticmethod
+    def _load_matrix(path):
+        return sparse.load_npz(path).tocsr()
+
+    @staticmethod
+    def _stack(matrix, rows):
+        return sparse.vstack([matrix, rows], format='csr')
+
+    def _job_vectors(self, features):
+        return features
+
+    def _partial_fit(self, features, total_samples):
+        # The IDF weights stay fixed until the next full rebuild
+        pass
+
+
+INDEX_TYPES = {index_type.name: index_type for index_type in (LDAJobIndex, TfidfJobIndex)}
+
+
+def load_or_build_index(method, job_descriptions, index_dir=INDEX_DIR, rebuild=False):
+    """
+    Load the saved index for a method and bring it up to date with the corpus.
+
+    Jobs appended since the index was saved are folded in incrementally; the
+    index is fully rebuilt if the corpus changed in any other way, if the
+    incremental updates have drifted too far, or if rebuild is set.
+    """
+    index_type = INDEX_TYPES[method]
+    index = None if rebuild else index_type.load(index_dir)
+    if index is not None:
+        if index.version == corpus_fingerprint(job_descriptions):
+            return index
+        if index.can_update(job_descriptions):
+            index.update(job_descriptions)
+            if not index.needs_rebuild():
+                index.save(index_dir)
+                return index
+            incremental_fraction, oov_rate = index.drift()
+            logging.info(f"{method} index drifted ({incremental_fraction:.0%} incremental jobs, "
+                         f"{oov_rate:.0%} unseen tokens), rebuilding.")
+        else:
+            logging.warning(f"{method} index {index.version[:12]} does not match the corpus, rebuilding.")
+    index = index_type.build(job_descriptions)
+    index.save(index_dir)
+    return index
+
+
+class CourseVectors:
+    """
+    Every catalog course projected once into a model's feature space, keyed by
+    course code, so scoring a set of courses is a row lookup plus a weighted sum.
+    """
+
+    def __init__(self, codes, matrix, manifest):
+        self.codes = codes
+        self.matrix = matrix
+        self.manifest = manifest
+        # Cross-listed courses share a code, so a code can map to several rows
+        self.rows_by_code = defaultdict(list)
+        for row, code in enumerate(codes):
+            self.rows_by_code[code].append(row)
+
+    @classmethod
+    def build(cls, name, transform, courses, source_version):
+        """
+        Vectorize every course with transform, the feature map of the model identified by source_version.
+        """
+        start = time.perf_counter()
+        matrix = transform([course['Description'] for course in courses])
+        manifest = {
+            'format_version': INDEX_FORMAT_VERSION,
+            'name': name,
+            'source_version': source_version,
+            'catalog_version': catalog_fingerprint(courses),
+            'n_courses': len(courses),
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        logging.info(f"Vectorized {len(courses)} courses for {name} in {time.perf_counter() - start:.2f}s.")
+        return cls([course['Code'] for course in courses], matrix, manifest)
+
+    def save(self, index_dir=INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        joblib.dump({'codes': self.codes, 'matrix': self.matrix, 'manifest': self.manifest},
+                    os.path.join(index_dir, f"{self.manifest['name']}_courses.joblib"))
+
+    @classmethod
+    def load(cls, name, index_dir=INDEX_DIR):
+        path = os.path.join(index_dir, f'{name}_courses.joblib')
+        if not os.path.isfile(path):
+            return None
+        saved = joblib.load(path)
+        if saved['manifest'].get('format_version') != INDEX_FORMAT_VERSION:
+            return None
+        return cls(saved['codes'], saved['matrix'], saved['manifest'])
+
+    def profiles(self, code_sets, weight_sets=None):
+        """
+        Stack one weighted profile per set of course codes; codes not in the catalog are skipped.
+        """
+        rows = []
+        row_weight_sets = []
+        for i, codes in enumerate(code_sets):
+            weights = weight_sets[i] if weight_sets and weight_sets[i] is not None else [1] * len(codes)
+            row_weights = []
+            for code, weight in zip(codes, weights):
+                for row in self.rows_by_code.get(code, ()):
+                    rows.append(row)
+                    row_weights.append(weight)
+            row_weight_sets.append(row_weights)
+        with stage('profile'):
+            return profile_matrix(self.matrix[rows], row_weight_sets)
+
+
+def load_or_build_course_vectors(index, courses, index_dir=INDEX_DIR):
+    """
+    Load the course vectors for a job index, rebuilding them if the index or the catalog changed.
+    """
+    course_vectors = CourseVectors.load(index.name, index_dir)
+    if (course_vectors is not None and course_vectors.manifest['source_version'] == index.version
+            and course_vectors.manifest['catalog_version'] == catalog_fingerprint(courses)):
+        return course_vectors
+    course_vectors = CourseVectors.build(index.name, index.transform, courses, index.version)
+    course_vectors.save(index_dir)
+    return course_vectors
+
+
+def refresh_indexes(jobs, index_dir=INDEX_DIR):
+    """
+    Bring every saved index up to date with the raw job corpus.
+    """
+    job_descriptions = extract_job_descriptions(jobs)
+    return {method: load_or_build_index(method, job_descriptions, index_dir) for method in INDEX_TYPES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the job matching indexes.")
+    parser.add_argument('--jobs', default='data/json/adzunaAPI_jobs.json',
+                        help="Job corpus JSON file or columnar table directory.")
+    parser.add_argument('--courses', default='data/json/wpi_courses.json',
+                        help="Course catalog JSON file or columnar table directory.")
+    parser.add_argument('--embeddings', action='store_true', help="Also embed every course with SentenceTransformer.")
+    parser.add_argument('--out', default=INDEX_DIR, help="Directory to write the index to.")
+    parser.add_argument('--method', choices=sorted(INDEX_TYPES), action='append',
+                        help="Index to build (repeatable); defaults to all.")
+    parser.add_argument('--topics', type=int, default=LDA_TOPICS)
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED)
+    parser.add_argument('--update', action='store_true',
+                        help="Fold newly appended jobs into the saved index instead of refitting it.")
+    args = parser.parse_args()
+
+    # Rows stream from the mapped columns into the extraction, which keeps only the skill-tagged jobs
+    job_descriptions = extract_job_descriptions(iter_records(args.jobs, JOB_COLUMNS))
+    courses = read_records(args.courses)
+
+    for method in args.method or sorted(INDEX_TYPES):
+        if args.update:
+            index = load_or_build_index(method, job_descriptions, args.out)
+        elif method == LDAJobIndex.name:
+            index = LDAJobIndex.build(job_descriptions, n_topics=args.topics, random_state=args.seed)
+        else:
+            index = INDEX_TYPES[method].build(job_descriptions)
+        index.save(args.out)
+        print(f"{method} index version {index.version} ({index.manifest['n_jobs']} jobs) written to {args.out}")
+        load_or_build_course_vectors(index, courses, args.out)
+
+    if args.embeddings:
+        from utils.comparator2 import build_course_embeddings, evict_stale_embeddings
+        build_course_embeddings(courses).save(args.out)
+        # The full catalog and corpus are at hand here, so this is where deleted documents are evicted
+        evict_stale_embeddings(courses, job_descriptions)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,17 @@ import json
 from jobspy import scrape_jobs
 from configs import *
 from data.labels import QUERIES
-from utils.azure_blob_storage import upload_to_blob
+from utils.columnar import read_source
+from utils.job_index import refresh_indexes
+from utils.job_store import JobStore
+from utils.near_duplicates import deduplicate_near_jobs, load_store_index, save_store_index
 
 # Dynamically set the project root
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
 
 # Define JSON file path relative to the project root
 JSON_OUTPUT_FILE = os.path.join(PROJECT_ROOT, "data/json/jobs.json")
+JOB_STORE_PATH = os.path.join(PROJECT_ROOT, JOB_STORE_DIR)
 
 def fetch_adzuna_jobs(query, location, page):
     """
@@ -83,29 +87,27 @@ def parse_jobspy_results(jobs):
             })
     return jobs_data
 
-def save_to_json(data, file_path):
+def save_to_store(data, store_dir):
     """
-    Save jobs to a JSON file.
+    Append jobs to the job store; only the new records are written.
     """
-    # Ensure the directory for the output file exists
-    directory = os.path.dirname(file_path)
-    os.makedirs(directory, exist_ok=True)
-
-    if os.path.isfile(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            try:
-                existing_data = json.load(f)
-            except json.JSONDecodeError:
-                existing_data = []
-    else:
-        existing_data = []
-
-    updated_data = existing_data + data
-
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(updated_data, f, indent=4, ensure_ascii=False)
-
-    print(f"Job listings saved to {file_path}")
+    store = JobStore(store_dir)
+    # The first run takes over the postings of the old read-modify-write JSON file
+    if len(store) == 0 and os.path.isfile(JSON_OUTPUT_FILE):
+        try:
+            store.append(read_source(JSON_OUTPUT_FILE))
+        except json.JSONDecodeError:
+            pass # If file is empty or invalid, start with an empty store
+
+    # Skip postings already stored or scraped from another site; the stored ones' signatures are kept per segment
+    index = load_store_index(store)
+    new_jobs = deduplicate_near_jobs(data, index, first_key=len(store))
+    store.append(new_jobs)
+    save_store_index(store, index)
+
+    print(f"{len(new_jobs)} job listings appended to {store_dir} "
+          f"({len(data) - len(new_jobs)} near-duplicates skipped, {len(store)} in total)")
+    return store
 
 def main():
     # Search Configuration
@@ -131,10 +133,13 @@ def main():
     # Print total number of job postings retrieved
     print(f"Total number of job postings scraped: {len(all_jobs)}")
 
-    # Save to JSON
-    save_to_json(all_jobs, JSON_OUTPUT_FILE)
-    # Upload the updated JSON file back to Azure Blob Storage
-    upload_to_blob("scraped-data", "adzuna_jobs.json")
+    # Append to the job store
+    store = save_to_store(all_jobs, JOB_STORE_PATH)
+    # Fold the new postings into the matching indexes without a full refit; the store is streamed, not copied
+    refresh_indexes(store)
+    # Exporting and uploading the JSON array read the whole store, so they are a separate step
+    print(f"Run `python -m utils.job_store export {JSON_OUTPUT_FILE} --upload adzuna_jobs.json` "
+          f"to refresh the JSON export in blob storage")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
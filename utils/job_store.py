@@ -0,0 +1,286 @@
+import argparse
+import bisect
+import json
+import logging
+import os
+import threading
+from itertools import islice
+
+import numpy as np
+
+from configs import JOB_STORE_DIR, JOB_STORE_SEGMENT_SIZE
+from utils.azure_blob_storage import upload_to_blob
+from utils.columnar import read_source
+
+MANIFEST_NAME = 'manifest.json'
+OFFSET_DTYPE = np.dtype('<i8')
+
+
+def posting_key(job):
+    # The same identity deduplicate_jobs() uses
+    return job.get('Title'), job.get('Employer'), job.get('Location')
+
+
+class JobStore:
+    """
+    Append-only store of job postings as newline-delimited JSON segments.
+
+    Each segment-NNNNNN.jsonl has a sidecar .idx of little-endian int64 record
+    offsets, so any record is one seek away. The manifest lists the live segments
+    and is replaced atomically, so a segment only becomes visible once it has
+    been written. Records are written before their offsets; on open, records
+    past the last indexed offset are re-indexed and a torn final line is dropped.
+    One writer process at a time is assumed, and compact() is meant to run offline.
+    Other modules may keep their own per-segment files next to a segment
+    (segment_path()); segments are never rewritten in place, and compact()
+    removes every file of the segments it replaces.
+    """
+
+    def __init__(self, directory=JOB_STORE_DIR, segment_size=JOB_STORE_SEGMENT_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            manifest = {'segments': [], 'next_segment': 1}
+        self.segments = manifest['segments']
+        self.next_segment = manifest['next_segment']
+        self._offsets = {name: self._read_offsets(name) for name in self.segments}
+        if self.segments:
+            self._recover(self.segments[-1])
+        self._update_starts()
+
+    def _path(self, name, suffix):
+        return os.path.join(self.directory, name + suffix)
+
+    def _read_offsets(self, name):
+        path = self._path(name, '.idx')
+        size = os.path.getsize(path)
+        if size % OFFSET_DTYPE.itemsize:
+            # An offset torn by a crash; its record is re-indexed by _recover()
+            with open(path, 'rb+') as file:
+                file.truncate(size - size % OFFSET_DTYPE.itemsize)
+        return np.fromfile(path, dtype=OFFSET_DTYPE)
+
+    def _recover(self, name):
+        offsets = self._offsets[name]
+        data_path = self._path(name, '.jsonl')
+        with open(data_path, 'rb+') as file:
+            end = 0
+            if len(offsets):
+                file.seek(int(offsets[-1]))
+                end = int(offsets[-1]) + len(file.readline())
+            file.seek(end)
+            unindexed = []
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                unindexed.append(line)
+            position = end + sum(len(line) for line in unindexed)
+            if position < os.path.getsize(data_path):
+                logging.warning(f"Dropping a partly written record at the end of {data_path}.")
+                file.truncate(position)
+        if unindexed:
+            logging.warning(f"Indexing {len(unindexed)} records written to {data_path} without offsets.")
+            self._write_offsets(name, end, unindexed)
+
+    def _write_offsets(self, name, position, lines):
+        offsets = position + np.cumsum([0] + [len(line) for line in lines[:-1]], dtype=OFFSET_DTYPE)
+        with open(self._path(name, '.idx'), 'ab') as file:
+            file.write(offsets.astype(OFFSET_DTYPE).tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        self._offsets[name] = np.concatenate((self._offsets[name], offsets.astype(OFFSET_DTYPE)))
+
+    def _write_lines(self, name, lines):
+        with open(self._path(name, '.jsonl'), 'ab') as file:
+            position = file.tell()
+            file.writelines(lines)
+            file.flush()
+            os.fsync(file.fileno())
+        self._write_offsets(name, position, lines)
+
+    def _new_segment(self):
+        name = f'segment-{self.next_segment:06d}'
+        self.next_segment += 1
+        for suffix in ('.jsonl', '.idx'):
+            open(self._path(name, suffix), 'wb').close()
+        self._offsets[name] = np.empty(0, dtype=OFFSET_DTYPE)
+        return name
+
+    def _fill(self, lines, segments, size):
+        """
+        Append encoded lines to the last of segments, starting a new segment whenever one reaches segment_size.
+        """
+        batch = []
+        for line in lines:
+            if not segments or size >= self.segment_size:
+                if batch:
+                    self._write_lines(segments[-1], batch)
+                    batch = []
+                segments.append(self._new_segment())
+                size = 0
+            batch.append(line)
+            size += len(line)
+        if batch:
+            self._write_lines(segments[-1], batch)
+
+    def _publish(self, segments):
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump({'segments': segments, 'next_segment': self.next_segment}, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + '.tmp', path)
+        self.segments = segments
+        self._update_starts()
+
+    def _update_starts(self):
+        # Index of the first record in each segment
+        self._starts = [0]
+        for name in self.segments:
+            self._starts.append(self._starts[-1] + len(self._offsets[name]))
+
+    def __len__(self):
+        return self._starts[-1]
+
+    def segment_path(self, name, suffix):
+        return self._path(name, suffix)
+
+    def segment_sizes(self):
+        """
+        Return the (name, record count) of each live segment, in store order.
+        """
+        with self._lock:
+            return [(name, len(self._offsets[name])) for name in self.segments]
+
+    def read_segment(self, name, start=0):
+        """
+        Iterate over the records of one segment from its start-th record on, seeking past the earlier ones.
+        """
+        offsets = self._offsets[name]
+        if start >= len(offsets):
+            return
+        with open(self._path(name, '.jsonl'), 'rb') as file:
+            file.seek(int(offsets[start]))
+            for line in islice(file, len(offsets) - start):
+                yield json.loads(line)
+
+    def append(self, records):
+        """
+        Write only the new records, rotating to a fresh segment when the active one is full.
+        """
+        lines = ((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8') for record in records)
+        with self._lock:
+            segments = list(self.segments)
+            size = os.path.getsize(self._path(segments[-1], '.jsonl')) if segments else 0
+            self._fill(lines, segments, size)
+            if segments != self.segments:
+                self._publish(segments)
+            else:
+                self._update_starts()
+
+    def get(self, index):
+        with self._lock:
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError(f"Record {index} is out of range.")
+            segment = bisect.bisect_right(self._starts, index) - 1
+            name = self.segments[segment]
+            offset = int(self._offsets[name][index - self._starts[segment]])
+            with open(self._path(name, '.jsonl'), 'rb') as file:
+                file.seek(offset)
+                return json.loads(file.readline())
+
+    def _lines(self, segments=None):
+        for name in segments or list(self.segments):
+            # Only indexed records, so a record still being appended is never read
+            with open(self._path(name, '.jsonl'), 'rb') as file:
+                yield from islice(file, len(self._offsets[name]))
+
+    def __iter__(self):
+        for line in self._lines():
+            yield json.loads(line)
+
+    def compact(self, key=posting_key):
+        """
+        Rewrite the store into fresh segments without duplicate postings, keeping the first of each.
+        """
+        with self._lock:
+            old_segments = list(self.segments)
+            records_before = len(self)
+            seen = set()
+
+            def unique_lines():
+                for line in self._lines(old_segments):
+                    record_key = key(json.loads(line))
+                    if record_key not in seen:
+                        seen.add(record_key)
+                        yield line
+
+            segments = []
+            self._fill(unique_lines(), segments, 0)
+            self._publish(segments)
+            # Only removed once the manifest no longer lists them
+            old_prefixes = tuple(name + '.' for name in old_segments)
+            for file_name in os.listdir(self.directory):
+                if file_name.startswith(old_prefixes):
+                    os.remove(os.path.join(self.directory, file_name))
+            for name in old_segments:
+                del self._offsets[name]
+        return {'records_before': records_before, 'records_after': len(self), 'segments': len(segments)}
+
+    def export_json(self, file_path):
+        """
+        Write every record as one JSON array, streamed segment by segment, for readers of the old corpus file.
+        """
+        with open(file_path + '.tmp', 'wb') as file:
+            file.write(b'[')
+            for i, line in enumerate(self._lines()):
+                file.write(b',\n' if i else b'\n')
+                file.write(line.rstrip(b'\n'))
+            file.write(b'\n]\n')
+        os.replace(file_path + '.tmp', file_path)
+
+    def stats(self):
+        return {
+            'records': len(self),
+            'segments': len(self.segments),
+            'bytes': sum(os.path.getsize(self._path(name, '.jsonl')) for name in self.segments),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the append-only job store.")
+    parser.add_argument('--dir', default=JOB_STORE_DIR, help="Store directory.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('import', help="Append the records of a JSON array or CSV file.").add_argument('file')
+    export = commands.add_parser('export', help="Write every record to a JSON array file.")
+    export.add_argument('file')
+    export.add_argument('--upload', metavar='BLOB', help="Also upload the file to blob storage under this name.")
+    commands.add_parser('compact', help="Drop duplicate postings and rewrite the segments.")
+    commands.add_parser('stats', help="Print the record, segment and byte counts.")
+    args = parser.parse_args()
+
+    store = JobStore(args.dir)
+    if args.command == 'import':
+        records = read_source(args.file)
+        store.append(records)
+        print(f"Appended {len(records)} records from {args.file}.")
+    elif args.command == 'export':
+        store.export_json(args.file)
+        print(f"Exported {len(store)} records to {args.file}.")
+        if args.upload:
+            print(upload_to_blob(args.file, args.upload))
+    elif args.command == 'compact':
+        print(store.compact())
+    else:
+        print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
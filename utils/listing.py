@@ -0,0 +1,32 @@
+def parse_fields(fields, allowed):
+    """
+    Parse a comma-separated fields= parameter; None or empty selects every field.
+    """
+    if not fields:
+        return None
+    selected = list(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields {', '.join(unknown)}; choose from {', '.join(allowed)}")
+    return selected
+
+
+def project(items, fields):
+    if fields is None:
+        return items
+    return [{field: item[field] for field in fields} for item in items]
+
+
+def page(items, offset=0, limit=None):
+    """
+    Return the page of items starting at offset, and the offset of the next page (None on the last page).
+    """
+    end = len(items) if limit is None else min(offset + limit, len(items))
+    return items[offset:end], (end if end < len(items) else None)
+
+
+def page_headers(total, next_offset):
+    headers = {'X-Total-Count': str(total)}
+    if next_offset is not None:
+        headers['X-Next-Offset'] = str(next_offset)
+    return headers
@@ -0,0 +1,220 @@
+import bisect
+import os
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from configs import (LSH_BANDS, MINHASH_PERMUTATIONS, NEAR_DUPLICATE_DESCRIPTION_WORDS, NEAR_DUPLICATE_THRESHOLD,
+                     NEAR_DUPLICATE_TITLE_THRESHOLD, RANDOM_SEED)
+
+SHINGLE_WORDS = 3
+# A prime just above 2**32, so (a * x + b) for 32-bit a, b and x never overflows uint64
+MERSENNE_PRIME = np.uint64(4294967311)
+# Per-segment file of a JobStore holding the index entries of its postings
+SIDECAR_SUFFIX = '.minhash.npz'
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def title_words(job):
+    return set(WORD_PATTERN.findall((job.get('Title') or '').lower()))
+
+
+def posting_shingles(job, description_words=NEAR_DUPLICATE_DESCRIPTION_WORDS):
+    """
+    Word shingles of the start of a posting's description.
+
+    Adzuna truncates descriptions with a trailing ellipsis, so only the first
+    description_words words are used, and the word the ellipsis cut is dropped;
+    a truncated copy and the full text then share nearly all shingles.
+    """
+    description = job.get('Job Description') or job.get('Description') or ''
+    words = WORD_PATTERN.findall(description.lower())
+    if description.rstrip().endswith(('…', '...')):
+        words = words[:-1]
+    words = words[:description_words]
+    return {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 0))}
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of job postings' descriptions, banded into LSH buckets.
+
+    add() compares a posting only with those sharing a bucket in some band, so
+    building the index over a corpus is roughly linear, and new postings can be
+    checked as they arrive. A candidate is a duplicate when the estimated Jaccard
+    similarity of the descriptions reaches threshold and that of the title words
+    reaches title_threshold; descriptions alone would match different roles that
+    open with the same employer boilerplate. The first posting added is the canonical copy.
+
+    Only canonical postings are indexed. Their signatures, band keys and title
+    words can be saved per JobStore segment (see load_store_index()), so a store
+    is indexed once and later runs only hash the postings appended since.
+    """
+
+    def __init__(self, n_permutations=MINHASH_PERMUTATIONS, bands=LSH_BANDS, threshold=NEAR_DUPLICATE_THRESHOLD,
+                 title_threshold=NEAR_DUPLICATE_TITLE_THRESHOLD, seed=RANDOM_SEED):
+        if n_permutations % bands:
+            raise ValueError(f"{n_permutations} permutations do not split into {bands} bands.")
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 32, size=n_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 32, size=n_permutations, dtype=np.uint64)
+        self.bands = bands
+        self.rows = n_permutations // bands
+        # Odd multipliers that fold each band's rows into one 64-bit bucket key
+        self._band_multipliers = rng.integers(0, 2 ** 63, size=self.rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.threshold = threshold
+        self.title_threshold = title_threshold
+        # Everything that decides which postings are indexed, so saved entries are only reused when it matches
+        self.params = np.array([n_permutations, bands, seed, threshold, title_threshold,
+                                NEAR_DUPLICATE_DESCRIPTION_WORDS], dtype=np.float64)
+        self.signatures = []
+        self.titles = []
+        self.keys = []
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+
+    def signature(self, shingles):
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        return ((self.a[:, None] * hashes[None, :] + self.b[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+    def _band_keys(self, signature):
+        # Wraps around in uint64; a collision only adds a candidate that the signature check rejects
+        return (signature.reshape(self.bands, self.rows) * self._band_multipliers).sum(axis=1, dtype=np.uint64)
+
+    def _match(self, signature, title, band_keys):
+        candidates = set()
+        for buckets, band_key in zip(self._buckets, band_keys.tolist()):
+            candidates.update(buckets.get(band_key, ()))
+        for candidate in sorted(candidates):
+            other_title = self.titles[candidate]
+            title_similarity = len(title & other_title) / max(len(title | other_title), 1)
+            if (title_similarity >= self.title_threshold
+                    and np.mean(self.signatures[candidate] == signature) >= self.threshold):
+                return self.keys[candidate]
+        return None
+
+    def add(self, key, job):
+        """
+        Index job under key unless it nearly duplicates an indexed posting; return that posting's key if so.
+        """
+        shingles = posting_shingles(job)
+        # Postings with too little text to compare are never called duplicates
+        if not shingles:
+            return None
+        signature = self.signature(shingles)
+        title = title_words(job)
+        band_keys = self._band_keys(signature)
+        duplicate_of = self._match(signature, title, band_keys)
+        if duplicate_of is None:
+            self._insert(key, signature, title, band_keys)
+        return duplicate_of
+
+    def _insert(self, key, signature, title, band_keys):
+        position = len(self.signatures)
+        self.signatures.append(signature)
+        self.titles.append(title)
+        self.keys.append(key)
+        for buckets, band_key in zip(self._buckets, band_keys.tolist()):
+            buckets[band_key].append(position)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def load_entries(self, path, key_offset=0):
+        """
+        Index the canonical postings saved by save_entries() under their saved rows plus key_offset.
+
+        Returns how many postings the file covers, or 0 if it is missing or was saved with other parameters.
+        """
+        try:
+            with np.load(path) as saved:
+                if not np.array_equal(saved['params'], self.params):
+                    return 0
+                covered = int(saved['covered'])
+                rows, signatures, band_keys = saved['rows'], saved['signatures'], saved['band_keys']
+                titles = saved['titles'].tobytes().decode('utf-8').split('\n')
+        except (FileNotFoundError, ValueError, KeyError):
+            return 0
+        for row, signature, title, row_band_keys in zip(rows.tolist(), signatures, titles, band_keys):
+            self._insert(key_offset + row, signature, set(title.split()), row_band_keys)
+        return covered
+
+    def save_entries(self, path, first_key, covered):
+        """
+        Save the indexed postings keyed first_key to first_key + covered - 1, with keys stored relative to first_key.
+        """
+        # Keys are added in increasing order, so a key range is a contiguous run of entries
+        start = bisect.bisect_left(self.keys, first_key)
+        end = bisect.bisect_left(self.keys, first_key + covered)
+        signatures = np.array(self.signatures[start:end], dtype=np.uint64).reshape(-1, self.bands * self.rows)
+        titles = '\n'.join(' '.join(sorted(title)) for title in self.titles[start:end])
+        with open(path + '.tmp', 'wb') as file:
+            np.savez(file, params=self.params, covered=np.int64(covered),
+                     rows=np.array(self.keys[start:end], dtype=np.int64) - first_key, signatures=signatures,
+                     band_keys=np.array([self._band_keys(signature) for signature in signatures],
+                                        dtype=np.uint64).reshape(-1, self.bands),
+                     titles=np.frombuffer(titles.encode('utf-8'), dtype=np.uint8))
+        os.replace(path + '.tmp', path)
+
+
+def deduplicate_near_jobs(jobs, index=None, first_key=None):
+    """
+    Drop postings that nearly duplicate an earlier one, keeping the first of each like deduplicate_jobs().
+
+    Kept postings are indexed under first_key, first_key + 1, ..., i.e. their
+    positions once appended after first_key existing records; a non-empty
+    index needs first_key, so new keys do not collide with its own.
+    """
+    if index is None:
+        index = NearDuplicateIndex()
+    if first_key is None:
+        if len(index):
+            raise ValueError("first_key is required to add postings to a non-empty index.")
+        first_key = 0
+    kept = []
+    for job in jobs:
+        if index.add(first_key + len(kept), job) is None:
+            kept.append(job)
+    return kept
+
+
+def load_store_index(store, index=None):
+    """
+    Return a NearDuplicateIndex of a JobStore's postings keyed by record number.
+
+    Each segment's entries come from its sidecar; only postings that no sidecar
+    covers yet, such as ones appended by another writer, are read and hashed,
+    after which the sidecar is rewritten.
+    """
+    if index is None:
+        index = NearDuplicateIndex()
+    start = 0
+    for name, count in store.segment_sizes():
+        path = store.segment_path(name, SIDECAR_SUFFIX)
+        covered = index.load_entries(path, start)
+        if covered < count:
+            for row, job in enumerate(store.read_segment(name, covered), start + covered):
+                index.add(row, job)
+            index.save_entries(path, start, count)
+        start += count
+    return index
+
+
+def save_store_index(store, index):
+    """
+    Rewrite the sidecars of the segments that gained postings since they were saved, from index.
+    """
+    start = 0
+    for name, count in store.segment_sizes():
+        path = store.segment_path(name, SIDECAR_SUFFIX)
+        try:
+            with np.load(path) as saved:
+                covered = int(saved['covered']) if np.array_equal(saved['params'], index.params) else 0
+        except (FileNotFoundError, ValueError, KeyError):
+            covered = 0
+        if covered < count:
+            index.save_entries(path, start, count)
+        start += count
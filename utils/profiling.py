@@ -0,0 +1,161 @@
+import contextvars
+import cProfile
+import heapq
+import itertools
+import marshal
+import pstats
+import random
+import threading
+import time
+
+from configs import PROFILE_KEEP, PROFILE_SAMPLE_RATE
+
+# The profile of the request being handled in this context, if it is profiled
+_active_profile = contextvars.ContextVar('active_profile', default=None)
+
+
+class ActiveProfile:
+    """
+    A request's profile of the event loop thread, plus stats merged in from work it handed elsewhere.
+    """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.thread = threading.get_ident()
+        self._extra = []
+        self._lock = threading.Lock()
+
+    def merge(self, stats):
+        """
+        Add the stats of a profile taken in another thread or process.
+        """
+        with self._lock:
+            self._extra.append(stats)
+
+    def stats(self):
+        self.profile.create_stats()
+        stats = dict(self.profile.stats)
+        with self._lock:
+            extra = list(self._extra)
+        for other in extra:
+            for function, function_stats in other.items():
+                stats[function] = pstats.add_func_stats(stats.get(function, (0, 0, 0, 0, {})), function_stats)
+        return stats
+
+
+def profiled_steps(iterable):
+    """
+    Iterate over iterable, adding each step to the current request's profile.
+
+    For generators run outside the event loop thread, such as the sync
+    generator of a StreamingResponse, which Starlette steps in its thread pool.
+    """
+    active = _active_profile.get()
+    if active is None or active.thread == threading.get_ident():
+        yield from iterable
+        return
+    profile = cProfile.Profile()
+    iterator = iter(iterable)
+    try:
+        while True:
+            # Steps may run on different pool threads, and a profiler only hooks the thread that enables it
+            profile.enable()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                profile.disable()
+            yield item
+    finally:
+        profile.create_stats()
+        active.merge(profile.stats)
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile capture of individual requests, keeping only the slowest ones.
+
+    Only one request is profiled at a time (the profiler hooks the whole thread),
+    and the profile of an async request also contains whatever else ran on the
+    event loop meanwhile. Work the request hands to other threads or worker
+    processes is only included when it reports back through merge() or
+    profiled_steps(). Profiles are stored in the marshalled pstats format
+    that pstats, snakeviz and gprof2dot open.
+    """
+
+    def __init__(self, keep=PROFILE_KEEP, sample_rate=PROFILE_SAMPLE_RATE):
+        self.keep = keep
+        self.sample_rate = sample_rate
+        # Min-heap on duration, so the fastest kept profile is the first evicted
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+
+    def wants(self, requested=False):
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def begin(self):
+        """
+        Start profiling the current context, or return None if another request is already being profiled.
+        """
+        if not self._active.acquire(blocking=False):
+            return None
+        active = ActiveProfile()
+        _active_profile.set(active)
+        active.profile.enable()
+        return active
+
+    def collecting(self):
+        """
+        Whether the current request is being profiled, so work it hands off should be profiled too.
+        """
+        return _active_profile.get() is not None
+
+    def merge(self, stats):
+        active = _active_profile.get()
+        if active is not None:
+            active.merge(stats)
+
+    def end(self, active, duration, **info):
+        """
+        Stop profiling and keep the profile if it is among the slowest. Returns its id, or None.
+        """
+        active.profile.disable()
+        _active_profile.set(None)
+        self._active.release()
+        with self._lock:
+            if len(self._heap) >= self.keep and duration <= self._heap[0][0]:
+                return None
+            profile_id = next(self._ids)
+
+        stats = active.stats()
+        entry = {
+            'id': profile_id,
+            'duration_ms': 1000 * duration,
+            'captured_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            **info,
+        }
+        with self._lock:
+            heapq.heappush(self._heap, (duration, profile_id, entry, marshal.dumps(stats)))
+            if len(self._heap) > self.keep:
+                heapq.heappop(self._heap)
+        return profile_id
+
+    def profiles(self):
+        """
+        Return the kept profiles' details, slowest first.
+        """
+        with self._lock:
+            return [entry for _, _, entry, _ in sorted(self._heap, key=lambda item: -item[0])]
+
+    def get(self, profile_id):
+        with self._lock:
+            for _, kept_id, entry, data in self._heap:
+                if kept_id == profile_id:
+                    return entry, data
+        return None
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+from configs import RESULT_CACHE_SIZE, RESULT_CACHE_TTL
+
+
+def profile_key(method, course_codes, weights, top_n):
+    """
+    Build a cache key that does not depend on the order the courses were selected in.
+    """
+    weights = weights if weights is not None else [1] * len(course_codes)
+    return method, tuple(sorted(zip(course_codes, (float(weight) for weight in weights)))), top_n
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of matching results with a per-entry time to live.
+
+    Entries belong to a version (e.g. the corpus and model versions); when
+    validate() sees a new version, every cached result is dropped.
+    """
+
+    def __init__(self, max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def validate(self, version):
+        """
+        Drop every entry if the results were computed against a different version.
+        """
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version):
+        """
+        Cache a result computed against version, unless the cache has moved on to another version since.
+        """
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+
+
+def incidence_matrix(skill_sets, skill_columns):
+    """
+    Build a sparse boolean (items x skills) matrix from one iterable of skill names per item.
+    """
+    rows = []
+    columns = []
+    for row, skills in enumerate(skill_sets):
+        for skill in skills:
+            rows.append(row)
+            columns.append(skill_columns[skill])
+    return sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, columns)),
+                             shape=(len(skill_sets), len(skill_columns)))
+
+
+class SkillIncidence:
+    """
+    Sparse jobs x skills and courses x skills incidence matrices, used to
+    compare what a student's courses and listed skills cover with what jobs ask for.
+    """
+
+    def __init__(self, skills, job_skills, course_codes, course_skills):
+        self.skills = list(skills)
+        self.skill_columns = {skill: column for column, skill in enumerate(self.skills)}
+        self._folded_columns = {skill.casefold(): column for skill, column in self.skill_columns.items()}
+        self.job_skills = job_skills
+        self.course_skills = course_skills
+        self.rows_by_code = defaultdict(list)
+        for row, code in enumerate(course_codes):
+            self.rows_by_code[code].append(row)
+        # How many jobs ask for each skill
+        self.demand = np.asarray(job_skills.sum(axis=0)).ravel()
+
+    @classmethod
+    def build(cls, skills, job_descriptions, courses, skill_matcher):
+        """
+        Tag jobs (already tagged by extract_job_descriptions) and courses with skills.
+        """
+        skill_columns = {skill: column for column, skill in enumerate(skills)}
+        job_skills = incidence_matrix([job['Skills'] for job in job_descriptions], skill_columns)
+        course_skills = incidence_matrix([skill_matcher.match(course['Description']) for course in courses],
+                                         skill_columns)
+        return cls(skills, job_skills, [course['Code'] for course in courses], course_skills)
+
+    def covered(self, course_codes, user_skills=()):
+        """
+        Return a boolean skill vector of what the courses and the user's own skills cover.
+
+        User skills are matched case-insensitively, since they are typed in by hand.
+        """
+        rows = [row for code in course_codes for row in self.rows_by_code.get(code, ())]
+        covered = np.asarray(self.course_skills[rows].sum(axis=0)).ravel() > 0
+        user_columns = [self._folded_columns.get(skill.strip().casefold()) for skill in user_skills]
+        covered[[column for column in user_columns if column is not None]] = True
+        return covered
+
+    def missing(self, job_rows, covered):
+        """
+        Return the skills each of the given jobs asks for that are not covered.
+        """
+        gaps = self.job_skills[job_rows].multiply(~covered).tocsr()
+        gaps.eliminate_zeros()
+        return [[self.skills[column] for column in gaps.indices[gaps.indptr[i]:gaps.indptr[i + 1]]]
+                for i in range(len(job_rows))]
+
+    def in_demand(self, top_n=10, covered=None):
+        """
+        Return the top N most requested skills with their job counts, optionally only uncovered ones.
+        """
+        demand = self.demand if covered is None else np.where(covered, 0, self.demand)
+        top = np.argsort(-demand, kind='stable')[:top_n]
+        return [(self.skills[column], int(demand[column])) for column in top if demand[column]]
@@ -0,0 +1,59 @@
+import re
+from functools import lru_cache
+
+# Characters that may not touch either end of a skill, so "C" does not match inside "C++" or "R" inside "R&D"
+BOUNDARY = r'\w+#&'
+
+
+def _pattern(skill):
+    # Multi-word skills may be split by any whitespace, including line breaks
+    return r'\s+'.join(re.escape(word) for word in skill.split())
+
+
+def is_case_sensitive(skill):
+    """
+    Short names and acronyms (R, Git, AWS, CAD, IoT) only count when written as such;
+    matching them case-insensitively would flag ordinary words.
+    """
+    return len(skill) <= 3 or skill.isupper()
+
+
+class SkillMatcher:
+    """
+    Match a fixed list of skills against free text with a single compiled regex.
+
+    Each text is scanned once, skills must sit on word boundaries, and results
+    are cached per text, so re-tagging an unchanged job description is free.
+    """
+
+    def __init__(self, skills, cache_size=65536):
+        self.skills = list(skills)
+        self._exact = {skill: skill for skill in self.skills if is_case_sensitive(skill)}
+        self._folded = {skill.casefold(): skill for skill in self.skills if not is_case_sensitive(skill)}
+
+        # Longest first, so the longest skill starting at a position wins. The lookahead makes
+        # every match zero-width, so overlapping skills ("Fluid Dynamics", "Dynamics") are all found.
+        exact = '|'.join(_pattern(skill) for skill in sorted(self._exact, key=len, reverse=True))
+        folded = '|'.join(_pattern(skill) for skill in sorted(self._folded.values(), key=len, reverse=True))
+        alternatives = '|'.join(filter(None, [exact, f'(?i:{folded})' if folded else '']))
+        self._regex = re.compile(rf'(?<![{BOUNDARY}])(?=((?:{alternatives}))(?![{BOUNDARY}]))')
+
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _canonical(self, text):
+        text = ' '.join(text.split())
+        skill = self._exact.get(text) or self._folded.get(text.casefold())
+        if skill is None:
+            # (?i) folds a few characters that casefold() maps elsewhere; find the skill whose pattern matched
+            skill = next(skill for skill in self._folded.values()
+                         if re.fullmatch(_pattern(skill), text, re.IGNORECASE))
+        return skill
+
+    def _match(self, text):
+        """
+        Return the frozenset of skills mentioned in text.
+        """
+        return frozenset(self._canonical(match.group(1)) for match in self._regex.finditer(text))
+
+    def cache_info(self):
+        return self.match.cache_info()
@@ -0,0 +1,376 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+
+from configs import AZURE_CONTAINER, STORAGE_BACKEND, STORAGE_CACHE_DIR, STORAGE_DIR
+
+# Initialize logging
+logging.basicConfig(level=logging.INFO)
+
+
+class BlobChangedError(Exception):
+    """
+    The blob changed while it was being read in ranges.
+    """
+
+
+class Storage(ABC):
+    """
+    Named blobs with ETags that change whenever a blob is rewritten.
+
+    Missing blobs raise FileNotFoundError in every backend. Large blobs are
+    moved in pieces (see utils/blob_transfer.py): read_range() reads part of
+    a blob, and stage_block() plus commit_blocks() write one from blocks.
+    """
+
+    @abstractmethod
+    def etag(self, name):
+        """
+        Return the current ETag of a blob.
+        """
+
+    @abstractmethod
+    def stat(self, name):
+        """
+        Return the (ETag, size in bytes) of a blob.
+        """
+
+    @abstractmethod
+    def read_range(self, name, offset, length, etag=None):
+        """
+        Read length bytes from offset; with etag, raise BlobChangedError if the blob no longer has it.
+        """
+
+    @abstractmethod
+    def stage_block(self, name, block_id, data):
+        """
+        Upload one block of a blob, to be put in place by commit_blocks().
+        """
+
+    @abstractmethod
+    def commit_blocks(self, name, block_ids):
+        """
+        Replace the blob with the staged blocks, in the given order, and return its new ETag.
+        """
+
+    @abstractmethod
+    def read(self, name):
+        """
+        Return the (content bytes, ETag) of a blob.
+        """
+
+    @abstractmethod
+    def write(self, name, data):
+        """
+        Create or overwrite a blob and return its new ETag.
+        """
+
+    def read_if_changed(self, name, etag):
+        """
+        Return the (content bytes, ETag) of a blob, or None if it still has etag.
+
+        Backends that can make the request conditional override this, so the
+        check and the download are one call and the content matches its ETag.
+        """
+        content, current_etag = self.read(name)
+        return None if current_etag == etag else (content, current_etag)
+
+
+class AzureStorage(Storage):
+    def __init__(self, connection_string=None, container=AZURE_CONTAINER):
+        # Imported here so the offline backends do not need the Azure SDK
+        from azure.storage.blob import BlobServiceClient
+
+        connection_string = connection_string or os.getenv('AZURE_STORAGE_KEY')
+        if not connection_string:
+            raise ValueError("Azure Storage connection string is not set.")
+        self.container_client = BlobServiceClient.from_connection_string(connection_string) \
+            .get_container_client(container)
+
+    def _call(self, name, function):
+        from azure.core.exceptions import ResourceModifiedError, ResourceNotFoundError
+        try:
+            return function(self.container_client.get_blob_client(name))
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"Blob {name} not found.")
+        except ResourceModifiedError:
+            raise BlobChangedError(f"Blob {name} changed during the transfer.")
+
+    def etag(self, name):
+        return self._call(name, lambda blob_client: blob_client.get_blob_properties().etag)
+
+    def read(self, name):
+        def download(blob_client):
+            downloader = blob_client.download_blob()
+            return downloader.readall(), downloader.properties.etag
+        return self._call(name, download)
+
+    def read_if_changed(self, name, etag):
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceNotModifiedError
+
+        def download(blob_client):
+            downloader = blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfModified)
+            return downloader.readall(), downloader.properties.etag
+        try:
+            return self._call(name, download)
+        except ResourceNotModifiedError:
+            return None
+
+    def write(self, name, data):
+        self.container_client.upload_blob(name=name, data=data, overwrite=True)
+        return self.etag(name)
+
+    def stat(self, name):
+        def properties(blob_client):
+            blob_properties = blob_client.get_blob_properties()
+            return blob_properties.etag, blob_properties.size
+        return self._call(name, properties)
+
+    def read_range(self, name, offset, length, etag=None):
+        from azure.core import MatchConditions
+        conditions = {'etag': etag, 'match_condition': MatchConditions.IfNotModified} if etag else {}
+        return self._call(name, lambda blob_client: blob_client.download_blob(
+            offset=offset, length=length, **conditions).readall())
+
+    def stage_block(self, name, block_id, data):
+        self.container_client.get_blob_client(name).stage_block(block_id=block_id, data=data)
+
+    def commit_blocks(self, name, block_ids):
+        from azure.storage.blob import BlobBlock
+        self.container_client.get_blob_client(name).commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids])
+        return self.etag(name)
+
+
+class LocalStorage(Storage):
+    """
+    Blobs as files in a directory.
+    """
+
+    def __init__(self, directory=STORAGE_DIR):
+        self.directory = directory
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def etag(self, name):
+        stat = os.stat(self._path(name))
+        return '"' + hashlib.md5(f'{stat.st_mtime_ns}:{stat.st_size}'.encode('utf-8')).hexdigest() + '"'
+
+    def read(self, name):
+        # The ETag is taken first, so a concurrent rewrite is seen as a change next time
+        etag = self.etag(name)
+        with open(self._path(name), 'rb') as file:
+            return file.read(), etag
+
+    def read_if_changed(self, name, etag):
+        current_etag = self.etag(name)
+        if current_etag == etag:
+            return None
+        with open(self._path(name), 'rb') as file:
+            return file.read(), current_etag
+
+    def write(self, name, data):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'wb') as file:
+            file.write(data)
+        os.replace(path + '.tmp', path)
+        return self.etag(name)
+
+    def stat(self, name):
+        return self.etag(name), os.path.getsize(self._path(name))
+
+    def read_range(self, name, offset, length, etag=None):
+        with open(self._path(name), 'rb') as file:
+            if etag is not None and self.etag(name) != etag:
+                raise BlobChangedError(f"Blob {name} changed during the transfer.")
+            file.seek(offset)
+            return file.read(length)
+
+    def _block_path(self, name, block_id):
+        return os.path.join(self._path(name) + '.blocks', block_id)
+
+    def stage_block(self, name, block_id, data):
+        path = self._block_path(name, block_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+    def commit_blocks(self, name, block_ids):
+        path = self._path(name)
+        with open(path + '.tmp', 'wb') as file:
+            for block_id in block_ids:
+                with open(self._block_path(name, block_id), 'rb') as block:
+                    shutil.copyfileobj(block, file)
+        os.replace(path + '.tmp', path)
+        shutil.rmtree(path + '.blocks', ignore_errors=True)
+        return self.etag(name)
+
+
+class MemoryStorage(Storage):
+    """
+    Blobs in a dictionary, for tests and benchmarks.
+    """
+
+    def __init__(self, blobs=None):
+        self._blobs = {}
+        self._blocks = {}
+        self._lock = threading.Lock()
+        for name, data in (blobs or {}).items():
+            self.write(name, data)
+
+    def etag(self, name):
+        return self.read(name)[1]
+
+    def read(self, name):
+        with self._lock:
+            if name not in self._blobs:
+                raise FileNotFoundError(f"Blob {name} not found.")
+            return self._blobs[name]
+
+    def write(self, name, data):
+        etag = '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+        with self._lock:
+            self._blobs[name] = (bytes(data), etag)
+        return etag
+
+    def stat(self, name):
+        content, etag = self.read(name)
+        return etag, len(content)
+
+    def read_range(self, name, offset, length, etag=None):
+        content, current_etag = self.read(name)
+        if etag is not None and current_etag != etag:
+            raise BlobChangedError(f"Blob {name} changed during the transfer.")
+        return content[offset:offset + length]
+
+    def stage_block(self, name, block_id, data):
+        with self._lock:
+            self._blocks[name, block_id] = bytes(data)
+
+    def commit_blocks(self, name, block_ids):
+        with self._lock:
+            data = b''.join(self._blocks.pop((name, block_id)) for block_id in block_ids)
+        return self.write(name, data)
+
+
+class CachedStorage(Storage):
+    """
+    Read-through disk cache in front of a remote backend.
+
+    Each read is one conditional request that downloads the blob only when its
+    ETag differs from the cached copy's; when the remote cannot be reached,
+    the cached copy is served.
+    """
+
+    def __init__(self, backend, cache_dir=STORAGE_CACHE_DIR):
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, name):
+        path = os.path.join(self.cache_dir, name)
+        return path, path + '.etag'
+
+    def _cached_etag(self, name):
+        _, etag_path = self._paths(name)
+        try:
+            with open(etag_path, 'r', encoding='utf-8') as file:
+                return json.load(file)['etag']
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _read_cached(self, name):
+        path, _ = self._paths(name)
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def _store(self, name, content, etag):
+        path, etag_path = self._paths(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as file:
+            file.write(content)
+        os.replace(path + '.tmp', path)
+        # Written after the content, so a cached ETag always describes the file next to it
+        with open(etag_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump({'etag': etag}, file)
+        os.replace(etag_path + '.tmp', etag_path)
+
+    def etag(self, name):
+        return self.backend.etag(name)
+
+    def read(self, name):
+        cached_etag = self._cached_etag(name)
+        try:
+            if cached_etag is None:
+                changed = self.backend.read(name)
+            else:
+                changed = self.backend.read_if_changed(name, cached_etag)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            if cached_etag is None:
+                raise
+            logging.warning(f"Serving cached {name}; the storage backend is unreachable: {e}")
+            return self._read_cached(name), cached_etag
+
+        if changed is None:
+            self.hits += 1
+            return self._read_cached(name), cached_etag
+        self.misses += 1
+        content, etag = changed
+        self._store(name, content, etag)
+        return content, etag
+
+    def read_if_changed(self, name, etag):
+        content, current_etag = self.read(name)
+        return None if current_etag == etag else (content, current_etag)
+
+    def write(self, name, data):
+        etag = self.backend.write(name, data)
+        self._store(name, data, etag)
+        return etag
+
+    # Ranged reads and block writes go straight to the backend; the cache fills on the next read()
+
+    def stat(self, name):
+        return self.backend.stat(name)
+
+    def read_range(self, name, offset, length, etag=None):
+        return self.backend.read_range(name, offset, length, etag)
+
+    def stage_block(self, name, block_id, data):
+        self.backend.stage_block(name, block_id, data)
+
+    def commit_blocks(self, name, block_ids):
+        return self.backend.commit_blocks(name, block_ids)
+
+
+BACKENDS = {'azure': AzureStorage, 'local': LocalStorage, 'memory': MemoryStorage}
+# Backends slow enough to be worth a local copy
+REMOTE_BACKENDS = {'azure'}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """
+    Return the configured storage, created on first use.
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            storage = BACKENDS[STORAGE_BACKEND]()
+            if STORAGE_BACKEND in REMOTE_BACKENDS and STORAGE_CACHE_DIR:
+                storage = CachedStorage(storage, STORAGE_CACHE_DIR)
+            logging.info(f"Using {STORAGE_BACKEND} blob storage.")
+            _storage = storage
+        return _storage
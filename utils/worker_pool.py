@@ -0,0 +1,149 @@
+import asyncio
+import cProfile
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from configs import INDEX_DIR
+from utils.job_index import INDEX_TYPES, CourseVectors
+from utils.profiling import request_profiler
+
+# Per-process state, filled in by _init_worker
+_job_indexes = {}
+_course_vectors = {}
+
+
+def _init_worker(index_dir, versions):
+    """
+    Load the saved job indexes and course vectors once, when the worker starts.
+    """
+    for method, (index_version, catalog_version) in versions.items():
+        index = INDEX_TYPES[method].load(index_dir)
+        course_vectors = CourseVectors.load(method, index_dir)
+        if index is None or index.version != index_version or course_vectors is None \
+                or course_vectors.manifest['catalog_version'] != catalog_version:
+            raise RuntimeError(f"Saved {method} artifacts in {index_dir} do not match the server's versions.")
+        _job_indexes[method] = index
+        _course_vectors[method] = course_vectors
+
+
+def _ping():
+    return multiprocessing.current_process().name
+
+
+def _rank(method, code_sets, weight_sets, top_n, submitted_at):
+    started_at = time.time()
+    profiles = _course_vectors[method].profiles(code_sets, weight_sets)
+    ranked = _job_indexes[method].top_n_job_indices(profiles, top_n)
+    return ranked, started_at - submitted_at, time.time() - started_at
+
+
+def _rank_profiled(*args):
+    """
+    _rank() under cProfile, returning its stats too, for requests that are being profiled.
+    """
+    profile = cProfile.Profile()
+    result = profile.runcall(_rank, *args)
+    profile.create_stats()
+    return result, profile.stats
+
+
+class MatchingPool:
+    """
+    Pool of worker processes that score course profiles against the job
+    indexes, so CPU-heavy matching does not block the event loop.
+
+    Each worker loads the saved artifacts once at start; warm() starts every
+    worker up front so the first requests do not pay for it.
+    """
+
+    def __init__(self, workers, versions, index_dir=INDEX_DIR, window=1000):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(index_dir, versions),
+        )
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        # Recent (queue wait, run time) pairs, in seconds
+        self._timings = deque(maxlen=window)
+
+    def warm(self):
+        """
+        Start every worker and wait for them to load their artifacts.
+        """
+        start = time.perf_counter()
+        names = {future.result() for future in [self.executor.submit(_ping) for _ in range(self.workers * 2)]}
+        logging.info(f"Warmed {len(names)} matching workers in {time.perf_counter() - start:.2f}s.")
+
+    async def rank(self, method, code_sets, weight_sets, top_n):
+        """
+        Return the (job rows, scores) of the top N jobs per course profile, computed in a worker.
+        """
+        with self._lock:
+            self.in_flight += 1
+        try:
+            if request_profiler.collecting():
+                # The request's profile only covers this process, so the worker sends its own back
+                (ranked, queue_wait, run_time), stats = await asyncio.wrap_future(
+                    self.executor.submit(_rank_profiled, method, code_sets, weight_sets, top_n, time.time())
+                )
+                request_profiler.merge(stats)
+            else:
+                ranked, queue_wait, run_time = await asyncio.wrap_future(
+                    self.executor.submit(_rank, method, code_sets, weight_sets, top_n, time.time())
+                )
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        with self._lock:
+            self.completed += 1
+            self._timings.append((queue_wait, run_time))
+        return ranked
+
+    def stats(self):
+        with self._lock:
+            timings = np.array(self._timings).reshape(-1, 2)
+            in_flight = self.in_flight
+            completed = self.completed
+            failed = self.failed
+
+        def summary(values):
+            if not len(values):
+                return {}
+            return {
+                'mean_ms': 1000 * float(values.mean()),
+                'p50_ms': 1000 * float(np.percentile(values, 50)),
+                'p95_ms': 1000 * float(np.percentile(values, 95)),
+                'max_ms': 1000 * float(values.max()),
+            }
+
+        return {
+            'workers': self.workers,
+            'in_flight': in_flight,
+            # Tasks waiting for a free worker
+            'queue_depth': max(0, in_flight - self.workers),
+            'completed': completed,
+            'failed': failed,
+            'queue_wait': summary(timings[:, 0]),
+            'run_time': summary(timings[:, 1]),
+        }
+
+    def shutdown(self, cancel_pending=True):
+        """
+        Stop the workers; with cancel_pending=False, queued tasks still run first.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=cancel_pending)